@@ -1,31 +1,199 @@
+import gzip
+import json
 import logging
+import os
+import random
+import time
+import zlib
 from datetime import datetime
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from api.circuit_breaker import CircuitBreaker
+from data.connectivity import get_connectivity_monitor
 from data.session import AppSession
-from models.barcode import Barcode
-from typing import List
+from models.barcode import Barcode, QueuedBarcode
+from typing import List, Sequence, Union
 
-from models.order import Order
-from models.process_type import ProcessType
+from models.order import ORDER_LIST, Order
+from models.process_type import PROCESS_TYPE_LIST, ProcessType
 from models.user import User
+from utils.timings import timings
+
+
+class ApiError(Exception):
+    """Ошибка ответа API с сохранённым HTTP-кодом"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class ApiClient:
-    BASE_URL = "http://srv-dnp.argos.loc"    # Prod
-    # BASE_URL = "http://127.0.0.1:8000"    # Dev
+    # Prod; для локального эмулятора (benchmarks/stand_in_server.py):
+    # SCANER_API_URL=http://127.0.0.1:8000
+    BASE_URL = os.environ.get("SCANER_API_URL", "http://srv-dnp.argos.loc").rstrip("/")
+    # Таймауты (подключение, чтение) по эндпоинтам, секунды
+    TIMEOUTS = {
+        "login": (3.05, 5),
+        "process_type": (3.05, 5),
+        "process_types": (3.05, 10),
+        "orders": (3.05, 15),
+        "order": (3.05, 5),
+        "import_barcode": (3.05, 3),
+        "import_barcodes": (3.05, 15),
+        "probe": (2, 2),
+    }
+    DEFAULT_TIMEOUT = (3.05, 5)
+    # Повторы только для идемпотентных запросов (GET)
+    MAX_RETRIES = 2
+    RETRY_STATUSES = (502, 503, 504)
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 4.0
+    # Общий для всех клиентов: сервер один
+    breaker = CircuitBreaker()
+    # Сжатие тела запроса: None, "auto" (gzip, пока сервер его принимает), "gzip" или "deflate".
+    # Выключено, пока сервер явно не настроен на приём сжатых тел
+    COMPRESSION = None
+    # Тела меньше порога отправляются как есть: выигрыш не окупает заголовки
+    COMPRESS_MIN_BYTES = 1024
+    # BASE_URL -> False, если сервер отверг сжатое тело
+    compression_supported = {}
+    # Ответы на сжатое тело, означающие, что сервер его не разобрал:
+    # 415 — явный отказ, 400/422 — обычный Django/ninja пытался прочитать gzip как JSON
+    COMPRESSION_REJECTED_STATUSES = (400, 415, 422)
+    # Ответ import-barcode на код, уже принятый сервером на этом этапе
+    ALREADY_IMPORTED_STATUS = 409
+    # Соединений с сервером на один клиент; лишние потоки ждут свободное соединение
+    POOL_MAXSIZE = 8
+
     def __init__(self):
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.POOL_MAXSIZE, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.csrf_token = None
+
+    def close(self) -> None:
+        """Закрывает соединения пула и забывает cookies сессии"""
+        self.session.close()
+        self.session.cookies.clear()
         self.csrf_token = None
 
+    @classmethod
+    def _backoff(cls, attempt: int) -> float:
+        """Экспоненциальная задержка с полным джиттером"""
+        return random.uniform(0, min(cls.BACKOFF_MAX, cls.BACKOFF_BASE * 2 ** attempt))
+
+    def _request(self, method: str, endpoint: str, path: str, **kwargs) -> requests.Response:
+        """Выполняет запрос с таймаутом эндпоинта, повторами и предохранителем.
+
+        Args:
+            method: HTTP-метод
+            endpoint: Ключ в TIMEOUTS
+            path: Путь относительно BASE_URL
+            **kwargs: Параметры requests (json, params, headers)
+
+        Returns:
+            Ответ сервера; коды ошибок проверяет вызывающий метод
+
+        Raises:
+            CircuitOpenError: Если сервер недавно был недоступен
+            requests.RequestException: Если запрос не удался после всех повторов
+        """
+        timeout = self.TIMEOUTS.get(endpoint, self.DEFAULT_TIMEOUT)
+        retries = self.MAX_RETRIES if method == "GET" else 0
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            started = time.monotonic()
+            try:
+                resp = self.session.request(
+                    method, f"{self.BASE_URL}{path}", timeout=timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record_outcome(False)
+                if attempt >= retries:
+                    raise
+                logging.warning(f"{endpoint}: попытка {attempt + 1} не удалась: {e}")
+            except requests.RequestException:
+                self._record_outcome(False)
+                raise
+            except BaseException:
+                # Исход неизвестен — не оставляем предохранитель в пробном состоянии
+                self.breaker.release_probe()
+                raise
+            else:
+                if resp.status_code < 500:
+                    self._record_outcome(True, time.monotonic() - started)
+                    return resp
+                self._record_outcome(False)
+                if resp.status_code not in self.RETRY_STATUSES or attempt >= retries:
+                    return resp
+                logging.warning(f"{endpoint}: попытка {attempt + 1}: HTTP {resp.status_code}")
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _compression(self) -> str:
+        if self.COMPRESSION == "auto":
+            return "gzip" if self.compression_supported.get(self.BASE_URL, True) else None
+        return self.COMPRESSION
+
+    @classmethod
+    def _encode_json(cls, data, encoding: str = None):
+        """Сериализует data в JSON и при необходимости сжимает.
+
+        Returns:
+            Тело запроса и заголовки Content-Type/Content-Encoding
+        """
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if encoding and len(body) >= cls.COMPRESS_MIN_BYTES:
+            if encoding == "gzip":
+                body = gzip.compress(body, compresslevel=6)
+            elif encoding == "deflate":
+                body = zlib.compress(body, 6)
+            else:
+                raise ValueError(f"Неизвестное сжатие: {encoding}")
+            headers["Content-Encoding"] = encoding
+        return body, headers
+
+    @classmethod
+    def _record_outcome(cls, ok: bool, latency: float = None) -> None:
+        """Передаёт исход запроса предохранителю и монитору связи"""
+        if ok:
+            cls.breaker.record_success()
+        else:
+            cls.breaker.record_failure()
+        get_connectivity_monitor().record(ok, latency)
+
+    def probe(self) -> bool:
+        """Дешёвая проверка доступности сервера (в обход предохранителя).
+
+        Returns:
+            True, если сервер ответил кодом меньше 500
+        """
+        started = time.monotonic()
+        try:
+            resp = self.session.head(f"{self.BASE_URL}/", timeout=self.TIMEOUTS["probe"])
+        except requests.RequestException:
+            self.breaker.record_failure()
+            return False
+        ok = resp.status_code < 500
+        if ok:
+            # Сервер снова отвечает — не ждём окончания RESET_TIMEOUT
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        logging.debug(f"probe: HTTP {resp.status_code} за {time.monotonic() - started:.3f} с")
+        return ok
+
     def login_by_token(self, token: str) -> User:
         data = {"token": token}
         try:
-            resp = self.session.post(
-                f"{self.BASE_URL}/api/v2/accounts/login/token",
-                json=data,
-                timeout=5
+            resp = self._request(
+                "POST", "login", "/api/v2/accounts/login/token", json=data
             )
             resp.raise_for_status()
         except requests.Timeout:
@@ -49,10 +217,8 @@ class ApiClient:
     def login(self, username: str, password: str) -> User:
         data = {"username": username, "password": password}
         try:
-            resp = self.session.post(
-                f"{self.BASE_URL}/api/v2/accounts/login",
-                json=data,
-                timeout=5
+            resp = self._request(
+                "POST", "login", "/api/v2/accounts/login", json=data
             )
             resp.raise_for_status()
         except requests.Timeout:
@@ -76,8 +242,8 @@ class ApiClient:
 
     def get_process_type(self, process_type_id: int) -> ProcessType:
         """Получает информацию о типе процесса и его этапах"""
-        resp = self.session.get(
-            f"{self.BASE_URL}/api/v2/orders/process-types/{process_type_id}"
+        resp = self._request(
+            "GET", "process_type", f"/api/v2/orders/process-types/{process_type_id}"
         )
         try:
             resp.raise_for_status()
@@ -89,8 +255,8 @@ class ApiClient:
             raise Exception(f"Ошибка получения типа процесса (код {resp.status_code}): {resp.text}") from e
 
     def get_orders(self) -> List[Order]:
-        resp = self.session.get(
-            f"{self.BASE_URL}/api/v2/orders/orders-filters-for-scaner",
+        resp = self._request(
+            "GET", "orders", "/api/v2/orders/orders-filters-for-scaner",
             params={
                 "order_by": "-name",
                 "using_barcode": True
@@ -98,25 +264,16 @@ class ApiClient:
         )
         try:
             resp.raise_for_status()
-            orders_data = resp.json()
-
-            orders = []
-
-            for order_data in orders_data:
-                order = Order(**order_data)
-
-                orders.append(order)
-
-            return orders
+            return ORDER_LIST.validate_json(resp.content)
         except requests.HTTPError as e:
             logging.error(f"Ошибка при выполнении запроса: {e}")
             logging.error(f"Ответ сервера: {resp.text}")
             raise Exception("Ошибка выполнения API-запроса") from e
 
     def get_process_types(self) -> List[ProcessType]:
-        resp = self.session.get(
-            f"{self.BASE_URL}/api/v2/orders/process-types",   # new api fron ninja
-            # f"{self.BASE_URL}/api/dnp/orders/process-types",   # old api from drf
+        resp = self._request(
+            "GET", "process_types", "/api/v2/orders/process-types",   # new api fron ninja
+            # "/api/dnp/orders/process-types",   # old api from drf
             params={"order_by": "-name", "using_barcode": True}
         )
         try:
@@ -125,7 +282,7 @@ class ApiClient:
             logging.error(f"Ошибка при выполнении запроса: {e}")
             raise Exception("Ошибка выполнения API-запроса") from e
 
-        return [ProcessType(**pt) for pt in resp.json()]
+        return PROCESS_TYPE_LIST.validate_json(resp.content)
 
     def create_barcode(self, data: dict):
         # Убедимся, что created_at в правильном формате
@@ -137,13 +294,17 @@ class ApiClient:
         }
 
         try:
-            resp = self.session.post(
-                f"{self.BASE_URL}/api/v2/barcode/import-barcode",
-                json=data,
-                headers=headers,
-                timeout=3
-            )
-            print(resp.text)
+            with timings.span("api.create_barcode"):
+                resp = self._request(
+                    "POST", "import_barcode", "/api/v2/barcode/import-barcode",
+                    json=data,
+                    headers=headers
+                )
+            logging.debug(f"import-barcode: HTTP {resp.status_code} {resp.text}")
+            if resp.status_code == self.ALREADY_IMPORTED_STATUS:
+                # Код уже на сервере (например, из пачки, ответ на которую не разобрали):
+                # для клиента он доставлен, повторять отправку незачем
+                return {"success": True, "duplicate": True}
             resp.raise_for_status()
             return resp.json()
         except requests.Timeout:
@@ -154,36 +315,62 @@ class ApiClient:
             print(f"API error: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def sent_barcodes(self, barcodes: List[Barcode]):
+    def sent_barcodes(self, barcodes: Sequence[Union[Barcode, QueuedBarcode]]):
         """Отправляет список штрих-кодов на сервер.
 
         Args:
-            barcodes: Список объектов Barcode для отправки
+            barcodes: Barcode или строки очереди QueuedBarcode
 
         Returns:
             Ответ сервера в формате JSON
 
         Raises:
-            Exception: Если произошла ошибка HTTP или другая ошибка
+            ApiError: Если сервер ответил ошибкой HTTP (код в status_code) или не JSON
+            Exception: Если произошла другая ошибка
         """
-        headers = {
-            "X-CSRFToken": self.csrf_token,
-            "Content-Type": "application/json"
-        } if self.csrf_token else {"Content-Type": "application/json"}
-        # Конвертируем список моделей в список словарей
-        data = [barcode.model_dump(exclude_unset=True) for barcode in barcodes]
+        # Только поля импорта, в JSON-совместимом виде
+        data = [barcode.import_payload() for barcode in barcodes]
+        encoding = self._compression()
         try:
-            resp = self.session.post(
-                f"{self.BASE_URL}/api/v2/barcode/import-barcodes",
-                json=data,
+            body, headers = self._encode_json(data, encoding)
+            if self.csrf_token:
+                headers["X-CSRFToken"] = self.csrf_token
+            resp = self._request(
+                "POST", "import_barcodes", "/api/v2/barcode/import-barcodes",
+                data=body,
                 headers=headers
             )
+            if resp.status_code in self.COMPRESSION_REJECTED_STATUSES and "Content-Encoding" in headers:
+                # Сервер не принимает сжатые тела — запоминаем и отправляем как есть
+                logging.warning(
+                    f"{self.BASE_URL}: сжатие {encoding} не поддерживается (HTTP {resp.status_code})"
+                )
+                self.compression_supported[self.BASE_URL] = False
+                body, headers = self._encode_json(data)
+                if self.csrf_token:
+                    headers["X-CSRFToken"] = self.csrf_token
+                resp = self._request(
+                    "POST", "import_barcodes", "/api/v2/barcode/import-barcodes",
+                    data=body,
+                    headers=headers
+                )
             resp.raise_for_status()
-            return resp.json()
+            try:
+                return resp.json()
+            except ValueError as e:
+                # requests.JSONDecodeError — ещё и RequestException: без перехвата
+                # sync_barcode принял бы его за недоступный сервер
+                raise ApiError(
+                    f"Некорректный ответ массового импорта (HTTP {resp.status_code}): {resp.text[:200]}",
+                    resp.status_code
+                ) from e
         except requests.HTTPError as e:
             error_msg = f"Ошибка HTTP {e.response.status_code}: {e.response.text}"
             logging.error(error_msg)
-            raise Exception(error_msg) from e
+            raise ApiError(error_msg, e.response.status_code) from e
+        except ApiError as e:
+            logging.error(str(e))
+            raise
         except Exception as e:
             logging.error(f"Ошибка при отправке штрих-кодов: {str(e)}")
             raise
@@ -191,10 +378,7 @@ class ApiClient:
     def get_order_by_id(self, order_id: int):
         """Получает заказ по ID с сервера"""
         try:
-            resp = self.session.get(
-                f"{self.BASE_URL}/api/v2/orders/{order_id}",
-                timeout=5
-            )
+            resp = self._request("GET", "order", f"/api/v2/orders/{order_id}")
             resp.raise_for_status()
             return resp.json()  # или Order(**resp.json()), если используете модель
         except requests.Timeout:
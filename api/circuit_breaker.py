@@ -0,0 +1,97 @@
+"""
+Предохранитель (circuit breaker) для запросов к серверу
+
+После FAILURE_THRESHOLD сетевых ошибок подряд предохранитель размыкается,
+и следующие RESET_TIMEOUT секунд запросы не выполняются вовсе — сразу
+бросается CircuitOpenError. Затем пропускается один пробный запрос:
+успех замыкает предохранитель, ошибка снова размыкает его.
+
+Примеры использования:
+    breaker = CircuitBreaker()
+    breaker.before_call()        # CircuitOpenError, если сервер недоступен
+    try:
+        resp = session.get(url, timeout=5)
+    except requests.ConnectionError:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release_probe()     # иначе пробный запрос «зависнет» навсегда
+        raise
+    breaker.record_success()
+"""
+
+import threading
+import time
+from typing import Optional
+
+import requests
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Сервер недавно был недоступен, запрос не выполнялся"""
+
+
+class CircuitBreaker:
+    FAILURE_THRESHOLD = 5
+    RESET_TIMEOUT = 30.0
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold or self.FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or self.RESET_TIMEOUT
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True, если запрос сейчас был бы отклонён"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            return self._probing or time.monotonic() - self._opened_at < self.reset_timeout
+
+    def retry_after(self) -> float:
+        """Сколько секунд осталось до пробного запроса"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def before_call(self) -> None:
+        """Пропускает запрос или бросает CircuitOpenError"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._probing:
+                raise CircuitOpenError(
+                    f"Сервер недоступен, повтор через {max(0, int(self.reset_timeout - waited))} с"
+                )
+            # Полуоткрытое состояние: пропускаем один пробный запрос
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self) -> None:
+        """Освобождает место пробного запроса, если он завершился без исхода.
+
+        Вызывается, когда запрос прервался исключением, которое не говорит
+        о доступности сервера; следующий запрос снова станет пробным.
+        """
+        with self._lock:
+            self._probing = False
+
+    def reset(self) -> None:
+        self.record_success()
@@ -0,0 +1,12 @@
+"""
+Бенчмарки без окна Kivy
+
+Запускаются из корня проекта как модули: python -m benchmarks.<имя>.
+Kivy импортируется слоем данных ради логгера и Clock, поэтому его разбор
+аргументов командной строки и вывод в консоль здесь отключены.
+"""
+
+import os
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
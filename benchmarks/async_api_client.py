@@ -0,0 +1,449 @@
+"""
+Асинхронный клиент API на asyncio
+
+Те же операции, что у ApiClient, но запросы выполняются корутинами в
+собственном потоке с циклом событий, и несколько запросов могут быть
+в полёте одновременно (не больше max_in_flight). Полезно для разбора
+очереди по одному штрих-коду: время запроса здесь определяется сетевой
+задержкой, а не объёмом данных.
+
+HTTP/1.1 реализован поверх asyncio streams с пулом keep-alive соединений.
+Таймауты, повторы, предохранитель, сжатие тела и монитор связи — общие
+с ApiClient. Клиент используется только бенчмарками и в сборку приложения
+не входит: cookies хранятся по имени, без учёта Domain, Path и Expires,
+чего достаточно для одного StandInServer.
+
+Примеры использования:
+    client = AsyncApiClient(max_in_flight=8)
+    client.submit(client.get_orders, callback=show_orders, error_callback=show_error)
+    future = client.submit(client.create_many, payloads)   # concurrent.futures.Future
+    results = future.result()
+    client.close()
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from http.cookies import SimpleCookie
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlencode, urlsplit
+
+import requests
+
+from api.api_client import ApiClient, ApiError
+from data.session import AppSession
+from models.barcode import Barcode, QueuedBarcode
+from models.order import ORDER_LIST, Order
+from models.process_type import PROCESS_TYPE_LIST, ProcessType
+from models.user import User
+from utils.ui_dispatch import dispatch_to_ui
+
+
+class _Response:
+    __slots__ = ("status_code", "headers", "content", "compressed")
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        # Тело запроса ушло сжатым (Content-Encoding)
+        self.compressed = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _StaleConnection(Exception):
+    """Сервер закрыл keep-alive соединение, пока оно ждало в пуле
+
+    written: запрос уже был записан в сокет целиком, и сервер мог его
+    обработать до закрытия соединения
+    """
+
+    def __init__(self, written: bool):
+        super().__init__("соединение закрыто сервером")
+        self.written = written
+
+
+class AsyncApiClient:
+    MAX_IN_FLIGHT = 8
+    # Методы, которые можно повторить после отправки запроса
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(
+            self,
+            base_url: Optional[str] = None,
+            max_in_flight: Optional[int] = None,
+            dispatch: Callable = dispatch_to_ui
+    ):
+        self.base_url = base_url or ApiClient.BASE_URL
+        self.max_in_flight = max_in_flight or self.MAX_IN_FLIGHT
+        self.csrf_token = None
+        self._dispatch = dispatch
+        parts = urlsplit(self.base_url)
+        self._host = parts.hostname
+        self._ssl = parts.scheme == "https"
+        self._port = parts.port or (443 if self._ssl else 80)
+        self._host_header = parts.netloc
+        self._cookies: Dict[str, str] = {}
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    # --- цикл событий ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="async-api", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def submit(
+            self,
+            func: Callable,
+            *args,
+            callback: Optional[Callable[[Any], None]] = None,
+            error_callback: Optional[Callable[[Exception], None]] = None,
+            **kwargs
+    ) -> concurrent.futures.Future:
+        """Запускает корутину func(*args) в цикле клиента.
+
+        Args:
+            callback: Получает результат в главном потоке
+            error_callback: Получает исключение в главном потоке
+
+        Returns:
+            Future, результат которого можно ждать из любого потока, кроме цикла клиента
+        """
+        future = asyncio.run_coroutine_threadsafe(func(*args, **kwargs), self._ensure_loop())
+
+        def done(f: concurrent.futures.Future):
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None:
+                logging.error(f"AsyncApiClient: {getattr(func, '__name__', func)}: {error}")
+                if error_callback:
+                    self._dispatch(error_callback, error)
+            elif callback:
+                self._dispatch(callback, f.result())
+
+        future.add_done_callback(done)
+        return future
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Закрывает соединения и останавливает поток цикла"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close_idle(), loop).result(timeout)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+        self._semaphore = None
+
+    async def _close_idle(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    # --- HTTP ---
+
+    async def _connection(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self._host, self._port, ssl=self._ssl or None)
+        return reader, writer, False
+
+    async def _exchange(self, method: str, target: str, body: bytes, headers: Dict[str, str], timeout):
+        connect_timeout, read_timeout = timeout
+        reader, writer, reused = await asyncio.wait_for(self._connection(), connect_timeout)
+        written = False
+        try:
+            lines = [
+                f"{method} {target} HTTP/1.1",
+                f"Host: {self._host_header}",
+                "Connection: keep-alive",
+                "Accept: application/json",
+                f"Content-Length: {len(body)}",
+            ]
+            if self._cookies:
+                lines.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self._cookies.items()))
+            lines.extend(f"{name}: {value}" for name, value in headers.items())
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            written = True
+            response, keep_alive = await asyncio.wait_for(self._read_response(reader, method), read_timeout)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            writer.close()
+            if reused:
+                raise _StaleConnection(written) from e
+            raise
+        except BaseException:
+            writer.close()
+            raise
+        if keep_alive and len(self._idle) < self.max_in_flight:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return response
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader, method: str = "GET") -> Tuple[_Response, bool]:
+        while True:
+            status_line = await reader.readline()
+            if not status_line:
+                raise asyncio.IncompleteReadError(b"", None)
+            version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+            status = int(status)
+            headers: Dict[str, str] = {}
+            set_cookies = []
+            while True:
+                line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                name, value = name.strip().lower(), value.strip()
+                if name == "set-cookie":
+                    set_cookies.append(value)
+                headers[name] = value
+            # 1xx — промежуточный ответ без тела, за ним идёт окончательный
+            if not 100 <= status < 200:
+                break
+        if method == "HEAD" or status in (204, 304):
+            # Тела нет, даже если есть Content-Length; чтение до EOF
+            # повисло бы на keep-alive соединении до таймаута
+            content = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await reader.read()
+        if set_cookies:
+            headers["set-cookie"] = "\n".join(set_cookies)
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+        return _Response(status, headers, content), keep_alive
+
+    def _remember_cookies(self, response: _Response) -> None:
+        for header in response.headers.get("set-cookie", "").split("\n"):
+            if header:
+                cookie = SimpleCookie()
+                cookie.load(header)
+                self._cookies.update({name: morsel.value for name, morsel in cookie.items()})
+
+    async def _request(
+            self,
+            method: str,
+            endpoint: str,
+            path: str,
+            json_data=None,
+            params: Optional[dict] = None,
+            compress: bool = False
+    ) -> _Response:
+        """Выполняет запрос с таймаутом эндпоинта, повторами и предохранителем ApiClient.
+
+        Raises:
+            CircuitOpenError: Если сервер недавно был недоступен
+            requests.ConnectionError, requests.Timeout: Если запрос не удался после всех повторов
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        target = f"{path}?{urlencode(params)}" if params else path
+        headers: Dict[str, str] = {}
+        body = b""
+        if json_data is not None:
+            encoding = None
+            if compress:
+                encoding = ApiClient.COMPRESSION
+                if encoding == "auto":
+                    encoding = "gzip" if ApiClient.compression_supported.get(self.base_url, True) else None
+            body, headers = ApiClient._encode_json(json_data, encoding)
+        if self.csrf_token and method != "GET":
+            headers["X-CSRFToken"] = self.csrf_token
+
+        timeout = ApiClient.TIMEOUTS.get(endpoint, ApiClient.DEFAULT_TIMEOUT)
+        retries = ApiClient.MAX_RETRIES if method == "GET" else 0
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                ApiClient.breaker.before_call()
+                started = time.monotonic()
+                try:
+                    try:
+                        response = await self._exchange(method, target, body, headers, timeout)
+                    except _StaleConnection as e:
+                        # Остальные ждавшие в пуле соединения, скорее всего, тоже закрыты
+                        await self._close_idle()
+                        # Если запрос уже ушёл, сервер мог его выполнить: POST не повторяем
+                        if e.written and method not in self.IDEMPOTENT_METHODS:
+                            raise
+                        response = await self._exchange(method, target, body, headers, timeout)
+                except asyncio.TimeoutError as e:
+                    error = requests.Timeout(f"{endpoint}: превышено время ожидания")
+                    error.__cause__ = e
+                except (OSError, asyncio.IncompleteReadError, _StaleConnection) as e:
+                    error = requests.ConnectionError(f"{endpoint}: {e}")
+                    error.__cause__ = e
+                except BaseException:
+                    # Отмена или ошибка разбора: исход неизвестен, пробное место освобождаем
+                    ApiClient.breaker.release_probe()
+                    raise
+                else:
+                    self._remember_cookies(response)
+                    response.compressed = "Content-Encoding" in headers
+                    if response.status_code < 500:
+                        ApiClient._record_outcome(True, time.monotonic() - started)
+                        return response
+                    ApiClient._record_outcome(False)
+                    if response.status_code not in ApiClient.RETRY_STATUSES or attempt >= retries:
+                        return response
+                    error = None
+                if error is not None:
+                    ApiClient._record_outcome(False)
+                    if attempt >= retries:
+                        raise error
+                    logging.warning(f"{endpoint}: попытка {attempt + 1} не удалась: {error}")
+                await asyncio.sleep(ApiClient._backoff(attempt))
+                attempt += 1
+
+    @staticmethod
+    def _raise_for_status(response: _Response, message: str) -> None:
+        if response.status_code >= 400:
+            raise ApiError(f"{message} (код {response.status_code}): {response.text}", response.status_code)
+
+    # --- операции API ---
+
+    async def _login(self, path: str, data: dict, message: str) -> User:
+        response = await self._request("POST", "login", path, json_data=data)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail") if response.content else ""
+            except ValueError:
+                detail = response.text
+            raise ApiError(f"{message}: {detail}", response.status_code)
+        self.csrf_token = self._cookies.get("csrftoken")
+        AppSession.csrf_token = self.csrf_token
+        return User(**response.json())
+
+    async def login(self, username: str, password: str) -> User:
+        return await self._login(
+            "/api/v2/accounts/login",
+            {"username": username, "password": password},
+            "Ошибка авторизации",
+        )
+
+    async def login_by_token(self, token: str) -> User:
+        return await self._login(
+            "/api/v2/accounts/login/token", {"token": token}, "Ошибка авторизации по токену"
+        )
+
+    async def get_orders(self) -> List[Order]:
+        response = await self._request(
+            "GET", "orders", "/api/v2/orders/orders-filters-for-scaner",
+            params={"order_by": "-name", "using_barcode": True},
+        )
+        self._raise_for_status(response, "Ошибка выполнения API-запроса")
+        return ORDER_LIST.validate_json(response.content)
+
+    async def get_process_types(self) -> List[ProcessType]:
+        response = await self._request(
+            "GET", "process_types", "/api/v2/orders/process-types",
+            params={"order_by": "-name", "using_barcode": True},
+        )
+        self._raise_for_status(response, "Ошибка выполнения API-запроса")
+        return PROCESS_TYPE_LIST.validate_json(response.content)
+
+    async def get_process_type(self, process_type_id: int) -> ProcessType:
+        response = await self._request(
+            "GET", "process_type", f"/api/v2/orders/process-types/{process_type_id}"
+        )
+        self._raise_for_status(response, "Ошибка получения типа процесса")
+        return ProcessType(**response.json())
+
+    async def create_barcode(self, data: dict) -> dict:
+        """Отправляет один штрих-код.
+
+        Returns:
+            Ответ сервера; при ошибке HTTP — {"success": False, "error": ...}
+
+        Raises:
+            requests.ConnectionError, requests.Timeout: Если сервер недоступен
+        """
+        if isinstance(data.get("created_at"), datetime):
+            data = {**data, "created_at": data["created_at"].isoformat()}
+        response = await self._request(
+            "POST", "import_barcode", "/api/v2/barcode/import-barcode", json_data=data
+        )
+        if response.status_code >= 400:
+            return {"success": False, "error": f"HTTP {response.status_code}: {response.text}"}
+        try:
+            return response.json()
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
+    async def create_many(self, payloads: List[dict]) -> List[bool]:
+        """Отправляет штрих-коды по одному, не больше max_in_flight одновременно.
+
+        Returns:
+            Флаги успеха в порядке payloads; недоступность сервера даёт False
+        """
+        async def send(payload: dict) -> bool:
+            try:
+                return bool((await self.create_barcode(payload)).get("success", False))
+            except requests.RequestException as e:
+                logging.warning(f"create_many: {e}")
+                return False
+
+        return list(await asyncio.gather(*(send(payload) for payload in payloads)))
+
+    async def sent_barcodes(self, barcodes: Sequence[Union[Barcode, QueuedBarcode]]):
+        """Отправляет список штрих-кодов через массовый импорт.
+
+        Raises:
+            ApiError: Если сервер ответил ошибкой HTTP (код в status_code)
+        """
+        data = [barcode.import_payload() for barcode in barcodes]
+        path = "/api/v2/barcode/import-barcodes"
+        response = await self._request("POST", "import_barcodes", path, json_data=data, compress=True)
+        if response.compressed and response.status_code in ApiClient.COMPRESSION_REJECTED_STATUSES:
+            logging.warning(f"{self.base_url}: сжатие не поддерживается (HTTP {response.status_code})")
+            ApiClient.compression_supported[self.base_url] = False
+            response = await self._request("POST", "import_barcodes", path, json_data=data)
+        if response.status_code >= 400:
+            raise ApiError(f"Ошибка HTTP {response.status_code}: {response.text}", response.status_code)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise ApiError(
+                f"Некорректный ответ массового импорта (HTTP {response.status_code}): {response.text[:200]}",
+                response.status_code
+            ) from e
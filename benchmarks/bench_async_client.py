@@ -0,0 +1,85 @@
+"""
+Бенчмарк отправки по одному штрих-коду: ApiClient против AsyncApiClient
+
+Отправляет одни и те же штрих-коды через import-barcode на локальный
+StandInServer с задержкой ответа (имитация сетевой задержки Wi-Fi):
+последовательно через ApiClient.create_barcode и через
+AsyncApiClient.create_many с разным числом запросов в полёте.
+Печатает время и пропускную способность.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_async_client --items 200 --latency 0.03
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from api.api_client import ApiClient
+from benchmarks.async_api_client import AsyncApiClient
+from benchmarks.stand_in_server import StandInServer
+
+
+def payloads(items: int):
+    started = datetime(2024, 5, 14, 8, 0, 0)
+    return [
+        {
+            "code": f"46{i:011d}",
+            "created_at": (started + timedelta(seconds=i * 2.5)).isoformat(),
+            "user_id": 17,
+            "order": 1532,
+            "stage": 4,
+            "is_good": True,
+        }
+        for i in range(items)
+    ]
+
+
+def bench_sequential(server: StandInServer, data) -> float:
+    server.barcodes.clear()
+    client = ApiClient()
+    started = time.perf_counter()
+    for payload in data:
+        assert client.create_barcode(dict(payload)).get("success")
+    return time.perf_counter() - started
+
+
+def bench_async(server: StandInServer, data, in_flight: int) -> float:
+    client = AsyncApiClient(max_in_flight=in_flight, dispatch=lambda func, *args: func(*args))
+    try:
+        client.submit(client.create_many, data[:in_flight]).result()  # прогрев соединений
+        # Сервер отвечает 409 на уже принятые коды: каждый прогон начинается с пустой базы
+        server.barcodes.clear()
+        started = time.perf_counter()
+        results = client.submit(client.create_many, data).result()
+        elapsed = time.perf_counter() - started
+    finally:
+        client.close()
+    assert all(results)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.03, help="задержка ответа сервера, секунды")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    server = StandInServer(latency=args.latency).start()
+    ApiClient.BASE_URL = server.url
+    data = payloads(args.items)
+    try:
+        print(f"items: {args.items}, server latency: {args.latency * 1000:.0f} ms")
+        print(f"{'client':16} {'seconds':>8} {'items/s':>8}")
+        elapsed = bench_sequential(server, data)
+        print(f"{'sequential':16} {elapsed:8.2f} {args.items / elapsed:8.1f}")
+        for in_flight in args.in_flight:
+            elapsed = bench_async(server, data, in_flight)
+            print(f"{f'async x{in_flight}':16} {elapsed:8.2f} {args.items / elapsed:8.1f}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
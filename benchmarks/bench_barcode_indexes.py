@@ -0,0 +1,101 @@
+"""
+Бенчмарк горячих запросов к таблице barcode до и после миграций
+
+Создаёт временную БД с N строками истории, замеряет проверку дубля,
+выборку неотправленных и историю заказа, затем применяет миграции
+и повторяет замеры.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_barcode_indexes --rows 200000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from data.db import make_engine
+from data.migrations import run_migrations
+from data.service import DatabaseService
+from models.models import Base, BarcodeORM
+
+ORDERS = 50
+STAGES = 8
+UNSENT_SHARE = 0.002
+
+
+def fill(engine, rows: int) -> None:
+    """Заполняет таблицу историей за несколько месяцев"""
+    start = datetime(2025, 1, 1)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                "code": f"{i:012d}",
+                "order": random.randrange(ORDERS),
+                "user_id": 1,
+                "stage": random.randrange(STAGES),
+                "is_good": True,
+                "created_at": start + timedelta(seconds=i * 30),
+                "is_sent": random.random() > UNSENT_SHARE,
+                "error_count": 0,
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(BarcodeORM), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(BarcodeORM), batch)
+
+
+def measure(func, repeat: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def run_queries(db: DatabaseService, rows: int, repeat: int) -> dict:
+    code = f"{rows // 2:012d}"
+    return {
+        "exists (code, order, stage)": measure(
+            lambda: db.exists(BarcodeORM, {"code": code, "order": 1, "stage": 1}), repeat
+        ),
+        "unsynced (is_sent = 0)": measure(db.get_unsynced_barcodes, repeat),
+        "history (order, created_at)": measure(
+            lambda: db.get_all(BarcodeORM, filters={"order": 1}, order_by="-created_at", limit=50),
+            repeat
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}")
+        Base.metadata.create_all(engine)
+        fill(engine, args.rows)
+        db = DatabaseService(sessionmaker(autoflush=False, autocommit=False, bind=engine))
+
+        before = run_queries(db, args.rows, args.repeat)
+        run_migrations(engine)
+        after = run_queries(db, args.rows, args.repeat)
+        engine.dispose()
+
+    print(f"rows: {args.rows}, repeat: {args.repeat}")
+    print(f"{'query':32} {'before, ms':>12} {'after, ms':>12} {'speedup':>9}")
+    for name in before:
+        print(f"{name:32} {before[name]:12.3f} {after[name]:12.3f} {before[name] / after[name]:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
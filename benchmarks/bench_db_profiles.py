@@ -0,0 +1,98 @@
+"""
+Бенчмарк профилей SQLite: вставки сканов и обновления синхронизации
+
+Для каждого профиля из data.db.ENGINE_PROFILES создаёт временную БД и
+замеряет, сколько строк в секунду проходит через DatabaseService:
+- insert: вставка по одной строке, каждая в своей транзакции (как скан);
+- update: обновление по одной строке, каждое в своей транзакции;
+- insert+sync: вставки из основного потока, пока фоновый поток отмечает
+  строки отправленными (как скан во время синхронизации).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_db_profiles --rows 2000
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.orm import sessionmaker
+
+from data.db import ENGINE_PROFILES, make_engine
+from data.migrations import run_migrations
+from data.service import DatabaseService
+from models.models import Base, BarcodeORM
+
+
+def barcode(i: int) -> dict:
+    return {
+        "code": f"{i:012d}",
+        "order": 1,
+        "user_id": 1,
+        "stage": 1,
+        "is_good": True,
+        "created_at": datetime.now(),
+        "is_sent": False,
+        "error_count": 0,
+    }
+
+
+def rate(rows: int, started: float) -> float:
+    return rows / (time.perf_counter() - started)
+
+
+def bench_profile(profile: str, rows: int, tmp: str) -> dict:
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, profile + '.sqlite3')}", profile=profile)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    db = DatabaseService(sessionmaker(autoflush=False, autocommit=False, bind=engine))
+
+    started = time.perf_counter()
+    ids = [db.insert(BarcodeORM, barcode(i)) for i in range(rows)]
+    insert_rate = rate(rows, started)
+
+    started = time.perf_counter()
+    for barcode_id in ids:
+        db.update(BarcodeORM, barcode_id, {"error_count": 1})
+    update_rate = rate(rows, started)
+
+    # Фоновый поток отмечает уже вставленные строки отправленными
+    stop = threading.Event()
+
+    def sync_loop():
+        position = 0
+        while not stop.is_set() and position < len(ids):
+            db.bulk_update(BarcodeORM, ids[position:position + 20], {"is_sent": True})
+            position += 20
+
+    syncer = threading.Thread(target=sync_loop)
+    syncer.start()
+    started = time.perf_counter()
+    for i in range(rows, rows * 2):
+        db.insert(BarcodeORM, barcode(i))
+    mixed_rate = rate(rows, started)
+    stop.set()
+    syncer.join()
+
+    engine.dispose()
+    return {"insert": insert_rate, "update": update_rate, "insert+sync": mixed_rate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"rows: {args.rows}, rows per second")
+    print(f"{'profile':12} {'insert':>10} {'update':>10} {'insert+sync':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ENGINE_PROFILES:
+            result = bench_profile(profile, args.rows, tmp)
+            print(f"{profile:12} {result['insert']:10.0f} {result['update']:10.0f} {result['insert+sync']:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Бенчмарк поиска заказов: линейный перебор против OrderSearchIndex
+
+Генерирует N заказов с названиями вида «Заказ 12345 Сборка», строит индекс
+и замеряет время поиска для запросов разной длины, в том числе при
+посимвольном наборе.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_order_search --orders 10000
+"""
+
+import argparse
+import random
+import time
+
+from models.order import Order
+from utils.order_search import OrderSearchIndex
+
+WORDS = ["Сборка", "Ремонт", "Упаковка", "Монтаж", "Пайка", "Проверка", "Склад"]
+
+
+def linear_search(orders, text):
+    """Прежняя реализация OrderSelectScreen.filter_orders"""
+    filtered = [order for order in orders if text.lower() in order.name.lower()]
+    return sorted(filtered, key=lambda o: o.name)
+
+
+def measure(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) * 1000 / repeat, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(1)
+    orders = [
+        Order(id=i, name=f"Заказ {random.randrange(100000):05d} {random.choice(WORDS)}")
+        for i in range(args.orders)
+    ]
+    started = time.perf_counter()
+    index = OrderSearchIndex(orders)
+    print(f"orders: {args.orders}, index build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    print(f"{'query':16} {'found':>7} {'linear, ms':>11} {'index, ms':>10}")
+    for query in ["з", "12", "123", "сбор", "4567", "ремонт", "заказ 0"]:
+        linear_ms, found = measure(lambda: linear_search(orders, query), args.repeat)
+        index_ms, _ = measure(lambda: (index.search(""), index.search(query))[1], args.repeat)
+        print(f"{query:16} {found:7} {linear_ms:11.3f} {index_ms:10.3f}")
+
+    # Посимвольный набор: каждый следующий запрос сужает предыдущий
+    typed = "заказ 0123"
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        index.search("")
+        for length in range(1, len(typed) + 1):
+            index.search(typed[:length])
+    per_key = (time.perf_counter() - started) * 1000 / args.repeat / len(typed)
+    print(f"typing '{typed}': {per_key:.3f} ms per keystroke")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Бенчмарк синхронизации по одному штрих-коду с разным числом потоков
+
+Заполняет временную БД неотправленными сканами и разбирает очередь через
+Repository.sync_barcode на StandInServer без массового импорта (только
+import-barcode) с задержкой ответа. Для каждого числа потоков печатает
+время разбора и пропускную способность.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_parallel_sync --rows 5000 --latency 0.03
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy.orm import sessionmaker
+
+from api.api_client import ApiClient
+from benchmarks.stand_in_server import StandInServer
+from data.db import make_engine
+from data.migrations import run_migrations
+from data.repository import Repository
+from data.service import DatabaseService
+from models.models import Base, BarcodeORM
+
+
+def fill(db: DatabaseService, rows: int) -> None:
+    db.delete_many(BarcodeORM)
+    db.bulk_insert(BarcodeORM, [
+        {
+            "code": f"46{i:011d}",
+            "order": 1532,
+            "user_id": 17,
+            "stage": 4,
+            "is_good": True,
+            "created_at": datetime.now(),
+            "is_sent": False,
+            "error_count": 0,
+        }
+        for i in range(rows)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.03, help="задержка ответа сервера, секунды")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server = StandInServer(latency=args.latency, bulk_import=False).start()
+    ApiClient.BASE_URL = server.url
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'sync.sqlite3')}")
+        Base.metadata.create_all(engine)
+        run_migrations(engine)
+        repo = Repository()
+        repo.db = DatabaseService(sessionmaker(autoflush=False, autocommit=False, bind=engine))
+        try:
+            print(f"rows: {args.rows}, server latency: {args.latency * 1000:.0f} ms, per-item import")
+            print(f"{'workers':>8} {'seconds':>8} {'items/s':>8} {'speedup':>8}")
+            baseline = None
+            for workers in args.workers:
+                fill(repo.db, args.rows)
+                server.barcodes.clear()
+                started = time.perf_counter()
+                stats = repo.sync_barcode(workers=workers)
+                elapsed = time.perf_counter() - started
+                assert stats["sent"] == args.rows, stats
+                baseline = baseline or elapsed
+                print(f"{workers:8d} {elapsed:8.2f} {args.rows / elapsed:8.1f} {baseline / elapsed:8.2f}")
+        finally:
+            server.stop()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Бенчмарк представления строк на горячих путях: pydantic против лёгких записей
+
+Для каждого пути печатает время и память на строку для прежнего и
+нового способа:
+- orders: разбор ответа со списком заказов (вложенные типы процессов
+  с этапами) — Order(**item) по одному против ORDER_LIST.validate_json;
+- queue: очередь синхронизации — ORM-объекты, словари и
+  Barcode.model_validate против кортежей get_rows и QueuedBarcode;
+- history: страница истории — словари get_keyset_page с правкой полей
+  против кортежей (raw=True) и одного словаря на строку.
+
+Память: пик tracemalloc при построении и сколько занимают сами строки,
+пока список жив.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_records --orders 2000 --rows 20000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from data.db import make_engine
+from data.migrations import run_migrations
+from data.service import DatabaseService
+from models.barcode import Barcode, IMPORT_FIELDS, QueuedBarcode
+from models.models import Base, BarcodeORM
+from models.order import ORDER_LIST, Order
+
+HISTORY_COLUMNS = ["id", "code", "is_sent", "created_at", "error_count"]
+
+
+def measure(build, rows: int, repeat: int = 3) -> dict:
+    """Время построения (лучшее из repeat), пик памяти и удерживаемая память на строку"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        "us": best / rows * 1e6,
+        "peak": (peak - before) / rows,
+        "kept": (current - before) / rows,
+    }
+
+
+def orders_body(count: int) -> bytes:
+    stages = [{"id": i, "name": f"Этап {i}", "sort_number": i} for i in range(8)]
+    return json.dumps([
+        {
+            "id": i,
+            "name": f"Заказ {i:05d}",
+            "sort_name": i,
+            "process_type_id": i % 12,
+            "process_type": {"id": i % 12, "name": f"Процесс {i % 12}", "stages": stages},
+        }
+        for i in range(count)
+    ]).encode("utf-8")
+
+
+def make_db(tmp: str, rows: int) -> DatabaseService:
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, 'records.sqlite3')}")
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    db = DatabaseService(sessionmaker(autoflush=False, autocommit=False, bind=engine))
+    started = datetime(2024, 5, 14, 8, 0, 0)
+    db.bulk_insert(BarcodeORM, [
+        {
+            "code": f"46{i:011d}",
+            "order": 1532,
+            "user_id": 17,
+            "stage": 4,
+            "is_good": True,
+            "created_at": started + timedelta(seconds=i),
+            "is_sent": False,
+            "error_count": 0,
+        }
+        for i in range(rows)
+    ])
+    return db
+
+
+def old_queue(db: DatabaseService):
+    rows = [Barcode.model_validate(row) for row in db.get_unsynced_barcodes()]
+    return rows, [row.model_dump(mode="json", include=IMPORT_FIELDS) for row in rows]
+
+
+def new_queue(db: DatabaseService):
+    rows = [
+        QueuedBarcode(*row)
+        for row in db.get_rows(BarcodeORM, QueuedBarcode.COLUMNS, {"is_sent": False})
+    ]
+    return rows, [row.import_payload() for row in rows]
+
+
+def old_history(db: DatabaseService, pages: int, limit: int):
+    result, cursor = [], None
+    for _ in range(pages):
+        rows = db.get_keyset_page(BarcodeORM, cursor=cursor, limit=limit, columns=HISTORY_COLUMNS)
+        for row in rows:
+            row["cursor"] = (row["created_at"], row["id"])
+            row["created_at"] = row["created_at"].strftime("%Y-%m-%d %H:%M:%S") if row["created_at"] else ""
+        cursor = rows[-1]["cursor"]
+        result.extend(rows)
+    return result
+
+
+def new_history(db: DatabaseService, pages: int, limit: int):
+    result, cursor = [], None
+    for _ in range(pages):
+        rows = [
+            {
+                "id": row_id,
+                "code": code,
+                "is_sent": is_sent,
+                "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S") if created_at else "",
+                "error_count": error_count,
+                "cursor": (created_at, row_id),
+            }
+            for row_id, code, is_sent, created_at, error_count in db.get_keyset_page(
+                BarcodeORM, cursor=cursor, limit=limit, columns=HISTORY_COLUMNS, raw=True
+            )
+        ]
+        cursor = rows[-1]["cursor"]
+        result.extend(rows)
+    return result
+
+
+def report(name: str, before: dict, after: dict) -> None:
+    print(
+        f"{name:8} {before['us']:8.2f} {after['us']:8.2f} {before['us'] / after['us']:6.1f}x"
+        f" {before['peak']:8.0f} {after['peak']:8.0f} {before['kept']:8.0f} {after['kept']:8.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--page", type=int, default=100)
+    args = parser.parse_args()
+
+    print("per row: us (before, after, speedup), peak bytes (before, after), kept bytes (before, after)")
+    print(f"{'path':8} {'us old':>8} {'us new':>8} {'':>7} {'peak old':>8} {'peak new':>8} {'kept old':>8} {'kept new':>8}")
+
+    body = orders_body(args.orders)
+    report(
+        "orders",
+        measure(lambda: [Order(**item) for item in json.loads(body)], args.orders),
+        measure(lambda: ORDER_LIST.validate_json(body), args.orders),
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_db(tmp, args.rows)
+        report("queue", measure(lambda: old_queue(db), args.rows), measure(lambda: new_queue(db), args.rows))
+        pages = min(args.rows // args.page, 50)
+        rows = pages * args.page
+        report(
+            "history",
+            measure(lambda: old_history(db, pages, args.page), rows),
+            measure(lambda: new_history(db, pages, args.page), rows),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Бенчмарк сжатия тела массовой отправки штрих-кодов
+
+Отправляет через ApiClient.sent_barcodes типичные пачки (один заказ, этап
+и пользователь, последовательные времена) на локальный StandInServer
+с ограниченной скоростью приёма и для каждого режима сжатия печатает
+размер тела по сети и медианное время отправки пачки.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_upload_compression --items 500 --bandwidth 250000
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from api.api_client import ApiClient
+from benchmarks.stand_in_server import StandInServer
+from models.barcode import Barcode
+
+MODES = (None, "deflate", "gzip")
+
+
+def batch(items: int):
+    started = datetime(2024, 5, 14, 8, 0, 0)
+    return [
+        Barcode(
+            id=i,
+            code=f"46{i:011d}",
+            order=1532,
+            user_id=17,
+            stage=4,
+            is_good=True,
+            created_at=started + timedelta(seconds=i * 2.5),
+        )
+        for i in range(items)
+    ]
+
+
+def bench_mode(server: StandInServer, mode, barcodes, repeat: int) -> dict:
+    ApiClient.COMPRESSION = mode
+    client = ApiClient()
+    client.sent_barcodes(barcodes)  # прогрев соединения
+    server.reset_stats()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        client.sent_barcodes(barcodes)
+        timings.append(time.perf_counter() - started)
+    return {"bytes": server.received_bytes // repeat, "time": statistics.median(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--bandwidth", type=int, default=250_000, help="байт/с, 0 — без ограничения")
+    args = parser.parse_args()
+
+    server = StandInServer(bandwidth=args.bandwidth or None).start()
+    ApiClient.BASE_URL = server.url
+    barcodes = batch(args.items)
+    try:
+        print(f"items: {args.items}, bandwidth: {args.bandwidth or 'unlimited'} B/s")
+        print(f"{'mode':8} {'bytes':>8} {'ratio':>6} {'ms':>8}")
+        baseline = None
+        for mode in MODES:
+            result = bench_mode(server, mode, barcodes, args.repeat)
+            baseline = baseline or result["bytes"]
+            print(
+                f"{mode or 'none':8} {result['bytes']:8d} "
+                f"{result['bytes'] / baseline:6.2f} {result['time'] * 1000:8.1f}"
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
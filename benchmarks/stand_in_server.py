@@ -0,0 +1,461 @@
+"""
+Локальный эмулятор API srv-dnp для бенчмарков и нагрузочных прогонов
+
+Отвечает на все эндпоинты, которые вызывает ApiClient:
+- POST /api/v2/accounts/login и /login/token — вход, cookies csrftoken
+  и sessionid;
+- GET /api/v2/orders/orders-filters-for-scaner, /orders/process-types,
+  /orders/process-types/{id}, /orders/{id} — заказы и типы процессов
+  с этапами, сгенерированные по seed;
+- POST /api/v2/barcode/import-barcode и /import-barcodes — приём сканов
+  с проверкой полей (422), дублей по (code, order, stage) и сжатых тел
+  (Content-Encoding gzip/deflate);
+- HEAD / — проверка связи.
+
+С require_auth запросы без cookie sessionid получают 401, а POST импорта
+без заголовка X-CSRFToken, совпадающего с cookie csrftoken, — 403.
+
+Нагрузку и сеть можно приблизить к перегруженному Wi-Fi и серверу:
+latency — задержка каждого ответа, error_rate — доля ответов error_status,
+max_rps — предел запросов в секунду (лишние ждут очереди), bandwidth —
+скорость приёма тела, байт/с.
+
+Примеры использования:
+    server = StandInServer(latency=0.03, error_rate=0.05, require_auth=True)
+    server.start()
+    ApiClient.BASE_URL = server.url
+    ApiClient().login("scanner", "scanner")
+    ...
+    server.received_bytes    # байт тел запросов, как пришли по сети
+    server.barcodes          # принятые штрих-коды
+    server.stop()
+
+Запуск отдельно (приложение берёт адрес из SCANER_API_URL):
+    python -m benchmarks.stand_in_server --port 8000 --latency 0.05 --require-auth
+    SCANER_API_URL=http://127.0.0.1:8000 python main.py
+"""
+
+import argparse
+import gzip
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+DECODERS = {
+    "gzip": gzip.decompress,
+    "deflate": zlib.decompress,
+}
+# Поля элемента импорта и их типы, как в BarcodeImportSchema
+IMPORT_FIELDS = {
+    "code": str,
+    "created_at": str,
+    "user_id": int,
+    "order": int,
+    "stage": int,
+    "is_good": bool,
+}
+PROCESS_TYPE_RE = re.compile(r"^/api/v2/orders/process-types/(\d+)$")
+ORDER_RE = re.compile(r"^/api/v2/orders/(\d+)$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело ответа пишутся отдельно — без этого Nagle добавляет ~40 мс
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        bandwidth = self.server.stand_in.bandwidth
+        if not bandwidth:
+            return self.rfile.read(length)
+        # Читаем порциями, выдерживая заданную скорость
+        chunks, started, received = [], time.perf_counter(), 0
+        while received < length:
+            chunk = self.rfile.read(min(16384, length - received))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+            delay = received / bandwidth - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        return b"".join(chunks)
+
+    def _send_json(self, status: int, data, cookies: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (cookies or {}).items():
+            http_only = "; HttpOnly" if name == "sessionid" else ""
+            self.send_header("Set-Cookie", f"{name}={value}; Path=/; SameSite=Lax{http_only}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _cookies(self) -> Dict[str, str]:
+        cookie = SimpleCookie()
+        cookie.load(self.headers.get("Cookie") or "")
+        return {name: morsel.value for name, morsel in cookie.items()}
+
+    def _before_response(self) -> bool:
+        """Очередь max_rps, задержка и случайные ошибки; False — ответ уже отправлен"""
+        stand_in = self.server.stand_in
+        stand_in.wait_for_slot()
+        if stand_in.latency:
+            time.sleep(stand_in.latency)
+        if stand_in.roll_error():
+            self._send_json(stand_in.error_status, {"detail": "Injected error"})
+            return False
+        return True
+
+    def _session(self) -> Optional[dict]:
+        """Сессия по cookie sessionid; None — 401 уже отправлен"""
+        stand_in = self.server.stand_in
+        session = stand_in.sessions.get(self._cookies().get("sessionid"))
+        if session is None and stand_in.require_auth:
+            self._send_json(401, {"detail": "Unauthorized"})
+            return None
+        return session or {}
+
+    def do_HEAD(self):
+        stand_in = self.server.stand_in
+        stand_in.count(0)
+        stand_in.wait_for_slot()
+        if stand_in.latency:
+            time.sleep(stand_in.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        stand_in.count(0)
+        if not self._before_response() or self._session() is None:
+            return
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/api/v2/orders/orders-filters-for-scaner":
+            self._send_json(200, stand_in.orders)
+        elif path == "/api/v2/orders/process-types":
+            self._send_json(200, list(stand_in.process_types.values()))
+        elif PROCESS_TYPE_RE.match(path):
+            process_type = stand_in.process_types.get(int(PROCESS_TYPE_RE.match(path).group(1)))
+            if process_type is None:
+                self._send_json(404, {"detail": "Not Found"})
+            else:
+                self._send_json(200, process_type)
+        elif ORDER_RE.match(path):
+            order_id = int(ORDER_RE.match(path).group(1))
+            order = next((order for order in stand_in.orders if order["id"] == order_id), None)
+            if order is None:
+                self._send_json(404, {"detail": "Not Found"})
+            else:
+                self._send_json(200, order)
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        raw = self._read_body()
+        stand_in.count(len(raw))
+        if not self._before_response():
+            return
+        encoding = self.headers.get("Content-Encoding")
+        if encoding:
+            if not stand_in.accept_compression or encoding not in DECODERS:
+                self._send_json(
+                    stand_in.compression_error_status, {"detail": f"Unsupported Content-Encoding: {encoding}"}
+                )
+                return
+            raw = DECODERS[encoding](raw)
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            self._send_json(400, {"detail": "Invalid JSON"})
+            return
+
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/api/v2/accounts/login":
+            user = stand_in.users.get(data.get("username"))
+            if user is None or user["password"] != data.get("password"):
+                self._send_json(401, {"detail": "Неверный логин или пароль"})
+            else:
+                self._login(user)
+        elif path == "/api/v2/accounts/login/token":
+            user = stand_in.users.get(stand_in.tokens.get(data.get("token")))
+            if user is None:
+                self._send_json(401, {"detail": "Неверный токен"})
+            else:
+                self._login(user)
+        elif path in ("/api/v2/barcode/import-barcode", "/api/v2/barcode/import-barcodes"):
+            self._import(path, data)
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def _login(self, user: dict) -> None:
+        csrf_token, session_id = secrets.token_hex(16), secrets.token_hex(16)
+        self.server.stand_in.sessions[session_id] = {"user": user, "csrftoken": csrf_token}
+        profile = {key: value for key, value in user.items() if key != "password"}
+        self._send_json(200, profile, cookies={"csrftoken": csrf_token, "sessionid": session_id})
+
+    def _import(self, path: str, data) -> None:
+        stand_in = self.server.stand_in
+        session = self._session()
+        if session is None:
+            return
+        if stand_in.require_auth:
+            csrf_token = self.headers.get("X-CSRFToken")
+            if not csrf_token or csrf_token != self._cookies().get("csrftoken"):
+                self._send_json(403, {"detail": "CSRF verification failed"})
+                return
+
+        if path.endswith("/import-barcodes"):
+            if not stand_in.bulk_import:
+                self._send_json(404, {"detail": "Not Found"})
+                return
+            if not isinstance(data, list):
+                self._send_json(422, {"detail": [{"loc": ["body"], "msg": "Input should be a valid list"}]})
+                return
+            results = []
+            for index, item in enumerate(data):
+                errors = stand_in.validate(item, ["body", index])
+                if errors:
+                    results.append({"success": False, "error": errors[0]["msg"]})
+                else:
+                    results.append(stand_in.accept(item))
+            self._send_json(200, {"results": results})
+            return
+
+        errors = stand_in.validate(data, ["body"])
+        if errors:
+            self._send_json(422, {"detail": errors})
+            return
+        result = stand_in.accept(data)
+        self._send_json(200 if result["success"] else 409, result)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    stand_in: "StandInServer"
+
+
+class StandInServer:
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            bandwidth: Optional[int] = None,
+            accept_compression: bool = True,
+            latency: float = 0.0,
+            bulk_import: bool = True,
+            error_rate: float = 0.0,
+            error_status: int = 503,
+            max_rps: Optional[float] = None,
+            require_auth: bool = False,
+            orders: int = 20,
+            process_types: int = 4,
+            seed: int = 0,
+            compression_error_status: int = 415
+    ):
+        """
+        Args:
+            port: 0 — свободный порт
+            bandwidth: Ограничение скорости приёма тела, байт/с
+            accept_compression: False — отвечать compression_error_status на сжатые тела
+            latency: Задержка перед каждым ответом, секунды
+            bulk_import: False — отвечать 404 на import-barcodes, как старые версии сервера
+            error_rate: Доля запросов, на которые сервер отвечает error_status
+            max_rps: Предел запросов в секунду; лишние запросы ждут своей очереди
+            require_auth: Требовать вход (cookie sessionid) и X-CSRFToken для импорта
+            orders: Сколько заказов сгенерировать
+            process_types: Сколько типов процессов сгенерировать
+            seed: Начальное значение для данных и случайных ошибок
+            compression_error_status: Ответ на сжатое тело без accept_compression:
+                415 или 400, как обычный Django, читающий gzip как JSON
+        """
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.bulk_import = bulk_import
+        self.accept_compression = accept_compression
+        self.compression_error_status = compression_error_status
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_rps = max_rps
+        self.require_auth = require_auth
+        self.received_bytes = 0
+        self.requests = 0
+        self.errors = 0
+        self.users = {
+            "scanner": {
+                "id": 1,
+                "username": "scanner",
+                "password": "scanner",
+                "first_name": "Тест",
+                "last_name": "Сканер",
+                "permissions": ["barcode.add_barcode"],
+                "is_authenticated": True,
+            }
+        }
+        self.tokens = {"scanner-token-0001": "scanner"}
+        self.sessions: Dict[str, dict] = {}
+        # (code, order, stage) принятых штрих-кодов
+        self.barcodes = set()
+        self._random = random.Random(seed)
+        self.process_types = self._make_process_types(process_types)
+        self.orders = self._make_orders(orders)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.stand_in = self
+        self._thread = None
+
+    def _make_process_types(self, count: int) -> Dict[int, dict]:
+        return {
+            type_id: {
+                "id": type_id,
+                "name": f"Процесс {type_id}",
+                "stages": [
+                    {"id": type_id * 100 + number, "name": f"Этап {number}", "sort_number": number}
+                    for number in range(1, self._random.randint(4, 8) + 1)
+                ],
+            }
+            for type_id in range(1, count + 1)
+        }
+
+    def _make_orders(self, count: int) -> list:
+        type_ids = list(self.process_types)
+        orders = []
+        for order_id in range(1, count + 1):
+            process_type = self.process_types[type_ids[order_id % len(type_ids)]]
+            orders.append({
+                "id": order_id,
+                "name": f"Заказ {order_id:05d}",
+                "sort_name": order_id,
+                "process_type_id": process_type["id"],
+                "process_type": process_type,
+            })
+        orders.sort(key=lambda order: order["name"], reverse=True)
+        return orders
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, size: int) -> None:
+        with self._lock:
+            self.received_bytes += size
+            self.requests += 1
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.received_bytes = 0
+            self.requests = 0
+            self.errors = 0
+
+    def wait_for_slot(self) -> None:
+        """Выдерживает max_rps: каждый запрос занимает свой интервал 1/max_rps"""
+        if not self.max_rps:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.max_rps
+        if slot > now:
+            time.sleep(slot - now)
+
+    def roll_error(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    @staticmethod
+    def validate(item, loc: list) -> list:
+        """Ошибки полей элемента импорта в формате ответа 422"""
+        if not isinstance(item, dict):
+            return [{"loc": loc, "msg": "Input should be a valid dictionary"}]
+        errors = []
+        for field, kind in IMPORT_FIELDS.items():
+            value = item.get(field)
+            # bool — подкласс int, поэтому user_id=True не считается числом
+            if value is None:
+                errors.append({"loc": loc + [field], "msg": "Field required"})
+            elif not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+                errors.append({"loc": loc + [field], "msg": f"Input should be a valid {kind.__name__}"})
+        if not errors:
+            if not item["code"].strip():
+                errors.append({"loc": loc + ["code"], "msg": "String should have at least 1 character"})
+            try:
+                datetime.fromisoformat(item["created_at"])
+            except ValueError:
+                errors.append({"loc": loc + ["created_at"], "msg": "Input should be a valid datetime"})
+        return errors
+
+    def accept(self, item: dict) -> dict:
+        key = (item["code"], item["order"], item["stage"])
+        with self._lock:
+            if key in self.barcodes:
+                return {"success": False, "error": "Штрих-код уже отсканирован на этом этапе"}
+            self.barcodes.add(key)
+        return {"success": True}
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--bandwidth", type=int, default=None, help="байт/с")
+    parser.add_argument("--no-compression", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.0, help="секунды")
+    parser.add_argument("--no-bulk", action="store_true", help="без import-barcodes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов с ошибкой")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--max-rps", type=float, default=None, help="запросов в секунду")
+    parser.add_argument("--require-auth", action="store_true", help="вход и X-CSRFToken обязательны")
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandInServer(
+        args.host, args.port, args.bandwidth, not args.no_compression, args.latency, not args.no_bulk,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        max_rps=args.max_rps,
+        require_auth=args.require_auth,
+        orders=args.orders,
+        seed=args.seed,
+    )
+    print(f"Serving on {server.url}")
+    print("Login: scanner / scanner, token: scanner-token-0001")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Набор бенчмарков слоя данных и синхронизации с результатом в JSON
+
+Работает без окна Kivy, на временных файлах SQLite и локальном
+StandInServer. Замеряет:
+- db.insert / db.exists / db.get_all / db.update: операции DatabaseService
+  по одной на таблице из N строк (1k, 100k, 1M), p50/p95/p99 на операцию;
+- history.page: первая и следующие страницы истории (keyset) на N строках;
+- export.<формат>: экспорт всех N строк в файл;
+- scan.save_and_send: пропускная способность Repository.save_and_send_barcode
+  (подтверждение скана) и время, за которое outbox разобран;
+- sync.drain.<режим>: разбор очереди из Q неотправленных через sync_barcode
+  массовым импортом и по одному.
+
+Результат — JSON с описанием машины и версии (git, Python, SQLite) и
+списком замеров; --compare печатает отношение к прежнему файлу.
+
+Запуск из корня проекта:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --sizes 1000 100000 --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from api.api_client import ApiClient
+from benchmarks.stand_in_server import StandInServer
+from data.db import make_engine
+from data.exporter import BarcodeExporter
+from data.migrations import run_migrations
+from data.repository import Repository
+from data.service import DatabaseService
+from data.sync_worker import get_sync_worker
+from models.models import Base, BarcodeORM
+from utils.timings import Timings
+
+ORDERS = 50
+STAGES = 8
+HISTORY_COLUMNS = ["id", "code", "is_sent", "created_at", "error_count"]
+STARTED = datetime(2025, 1, 1)
+
+
+def row(i: int, is_sent: bool = True, order: int = None, stage: int = None) -> dict:
+    return {
+        "code": f"{i:012d}",
+        "order": i % ORDERS if order is None else order,
+        "user_id": 1,
+        "stage": i // ORDERS % STAGES if stage is None else stage,
+        "is_good": True,
+        "created_at": STARTED + timedelta(seconds=i * 30),
+        "is_sent": is_sent,
+        "error_count": 0,
+    }
+
+
+def make_db(path: str):
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    return engine, DatabaseService(sessionmaker(autoflush=False, autocommit=False, bind=engine))
+
+
+def fill(engine, rows: int, start: int = 0, is_sent: bool = True) -> None:
+    """Быстрое заполнение таблицы пачками в одной транзакции"""
+    with engine.begin() as conn:
+        for offset in range(start, start + rows, 10000):
+            conn.execute(
+                insert(BarcodeORM),
+                [row(i, is_sent) for i in range(offset, min(offset + 10000, start + rows))]
+            )
+
+
+def result(name: str, rows: int, ops: int, seconds: float, samples: Timings = None, **extra) -> dict:
+    entry = {
+        "name": name,
+        "rows": rows,
+        "ops": ops,
+        "seconds": round(seconds, 4),
+        "ops_per_s": round(ops / seconds, 1) if seconds else None,
+    }
+    if samples is not None:
+        stage = samples.stats()[name]
+        entry.update({key: stage[key] for key in ("p50", "p95", "p99", "max")})
+    entry.update(extra)
+    return entry
+
+
+def timed(name: str, rows: int, calls) -> dict:
+    """Выполняет calls по одному и возвращает время и перцентили на вызов"""
+    samples = Timings(enabled=True)
+    samples.WINDOW = len(calls)
+    started = time.perf_counter()
+    for call in calls:
+        with samples.span(name):
+            call()
+    return result(name, rows, len(calls), time.perf_counter() - started, samples)
+
+
+def bench_db(db: DatabaseService, rows: int, ops: int) -> list:
+    rng = random.Random(rows)
+    existing = [rng.randrange(rows) for _ in range(ops)]
+    return [
+        timed("db.exists", rows, [
+            lambda i=i: db.exists(BarcodeORM, {"code": f"{i:012d}", "order": i % ORDERS, "stage": i // ORDERS % STAGES})
+            for i in existing
+        ]),
+        timed("db.get_all", rows, [
+            lambda i=i: db.get_all(
+                BarcodeORM, filters={"order": i % ORDERS, "stage": i % STAGES}, order_by="-created_at", limit=100
+            )
+            for i in existing[:max(ops // 5, 1)]
+        ]),
+        timed("db.update", rows, [
+            lambda i=i: db.update(BarcodeORM, i + 1, {"error_count": 1})
+            for i in existing
+        ]),
+        # Вставки последними: остальные замеры идут ровно на rows строках
+        timed("db.insert", rows, [
+            lambda i=i: db.insert(BarcodeORM, row(i))
+            for i in range(rows, rows + ops)
+        ]),
+    ]
+
+
+def bench_history(db: DatabaseService, rows: int, pages: int, page_size: int) -> list:
+    started = time.perf_counter()
+    first = db.get_keyset_page(BarcodeORM, limit=page_size, columns=HISTORY_COLUMNS, raw=True)
+    first_seconds = time.perf_counter() - started
+    cursor = (first[-1][3], first[-1][0])
+
+    def next_page():
+        nonlocal cursor
+        page = db.get_keyset_page(BarcodeORM, cursor=cursor, limit=page_size, columns=HISTORY_COLUMNS, raw=True)
+        if page:
+            cursor = (page[-1][3], page[-1][0])
+
+    return [
+        result("history.first_page", rows, 1, first_seconds, page_size=page_size),
+        dict(timed("history.page", rows, [next_page] * pages), page_size=page_size),
+    ]
+
+
+def bench_export(db: DatabaseService, rows: int, tmp: str, formats) -> list:
+    exporter = BarcodeExporter(db)
+    results = []
+    for fmt in formats:
+        path = os.path.join(tmp, f"export.{fmt}")
+        started = time.perf_counter()
+        written = exporter.export(path, fmt)
+        elapsed = time.perf_counter() - started
+        results.append(result(f"export.{fmt}", rows, written, elapsed, bytes=os.path.getsize(path)))
+        os.remove(path)
+    return results
+
+
+def bench_scans(repo: Repository, scans: int) -> list:
+    """Сканы подряд: подтверждение после записи в БД, отправка в фоне"""
+    worker = get_sync_worker()
+    worker.start()
+    # Один заказ и этап, как на смене; индекс дублей активной пары загружен
+    repo.load_duplicate_index(1, 1)
+    started = time.perf_counter()
+    for i in range(scans):
+        outcome = repo.save_and_send_barcode(row(10 ** 9 + i, is_sent=False, order=1, stage=1))
+        assert outcome["success"], outcome
+    acked = time.perf_counter() - started
+    worker.flush(timeout=600)
+    drained = time.perf_counter() - started
+    return [
+        result("scan.save_and_send", 0, scans, acked),
+        result("scan.outbox_drained", 0, scans, drained),
+    ]
+
+
+def bench_sync(repo: Repository, engine, server: StandInServer, queued: int) -> list:
+    results = []
+    for mode, bulk, count in (("bulk", True, queued), ("per_item", False, max(queued // 5, 1))):
+        repo.db.delete_many(BarcodeORM)
+        fill(engine, count, is_sent=False)
+        server.barcodes.clear()
+        server.bulk_import = bulk
+        Repository.bulk_unsupported_until.clear()
+        if not bulk:
+            Repository.bulk_unsupported_until[repo.api.BASE_URL] = float("inf")
+        started = time.perf_counter()
+        stats = repo.sync_barcode()
+        elapsed = time.perf_counter() - started
+        assert stats["sent"] == count, stats
+        results.append(result(f"sync.drain.{mode}", count, count, elapsed, workers=repo.SYNC_WORKERS))
+    Repository.bulk_unsupported_until.clear()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, baseline_path: str) -> None:
+    """Печатает отношение ops/s к прежнему прогону (больше 1 — быстрее)"""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {(item["name"], item["rows"]): item for item in json.load(file)["results"]}
+    print(f"{'name':24} {'rows':>8} {'ops/s old':>11} {'ops/s new':>11} {'ratio':>6}")
+    for item in results:
+        old = baseline.get((item["name"], item["rows"]))
+        if not old or not old["ops_per_s"] or not item["ops_per_s"]:
+            continue
+        print(
+            f"{item['name']:24} {item['rows']:8d} {old['ops_per_s']:11.1f} "
+            f"{item['ops_per_s']:11.1f} {item['ops_per_s'] / old['ops_per_s']:6.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--ops", type=int, default=500, help="операций БД на каждый размер")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--formats", nargs="+", default=list(BarcodeExporter.FORMATS))
+    parser.add_argument("--scans", type=int, default=1000)
+    parser.add_argument("--queue", type=int, default=5000, help="неотправленных для sync.drain")
+    parser.add_argument("--latency", type=float, default=0.005, help="задержка ответа сервера, секунды")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="прежний файл результатов")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            print(f"table of {rows} rows...", file=sys.stderr)
+            engine, db = make_db(os.path.join(tmp, f"db_{rows}.sqlite3"))
+            fill(engine, rows)
+            results += bench_history(db, rows, args.pages, args.page_size)
+            results += bench_export(db, rows, tmp, args.formats)
+            results += bench_db(db, rows, args.ops)
+            engine.dispose()
+
+        print("scans and sync...", file=sys.stderr)
+        server = StandInServer(latency=args.latency).start()
+        ApiClient.BASE_URL = server.url
+        engine, db = make_db(os.path.join(tmp, "sync.sqlite3"))
+        repo = Repository(db=db)
+        try:
+            results += bench_scans(repo, args.scans)
+            results += bench_sync(repo, engine, server, args.queue)
+        finally:
+            get_sync_worker().stop()
+            server.stop()
+            engine.dispose()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "revision": git_revision(),
+        "args": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    print(f"{'name':24} {'rows':>8} {'ops':>7} {'seconds':>9} {'ops/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for item in results:
+        print(
+            f"{item['name']:24} {item['rows']:8d} {item['ops']:7d} {item['seconds']:9.3f} "
+            f"{item['ops_per_s'] or 0:10.1f} {item.get('p50', ''):>8} {item.get('p95', ''):>8}"
+        )
+    print(f"saved to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ package.name = barcodescanner
 package.domain = argos.net
 source.dir = .
 source.include_exts = py,png,jpg,kv,atlas,json,txt
+source.exclude_dirs = benchmarks, tests
 version = 1.0
 
 orientation = portrait
@@ -0,0 +1,129 @@
+"""
+Офлайн-справочник заказов и типов процессов
+
+Заказы и типы процессов (с этапами) хранятся в OrderORM и ProcessTypeORM.
+Экран выбора заказа сразу показывает локальную копию, а обновление с сервера
+идёт в фоне (stale-while-revalidate). Время последнего успешного обновления
+хранится в MetaORM.
+
+Примеры использования:
+    catalog = OrderCatalog(DatabaseService(), ApiClient())
+    orders = catalog.load_local()        # без сети
+    if catalog.is_stale():
+        orders = catalog.refresh()       # сеть, вызывать из фонового потока
+"""
+
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from kivy import logger
+
+from models.models import MetaORM, OrderORM, ProcessTypeORM
+from models.order import Order
+from models.process_type import ProcessType
+
+
+class OrderCatalog:
+    UPDATED_AT_KEY = "orders_catalog_updated_at"
+    # Возраст локальной копии, после которого экран сам запускает обновление
+    MAX_AGE = 15 * 60
+
+    def __init__(self, db, api):
+        self.db = db
+        self.api = api
+
+    def load_local(self) -> List[Order]:
+        """Собирает заказы из локальной БД, этапы подставляются из ProcessTypeORM"""
+        process_types = {
+            row["id"]: self._process_type_from_row(row)
+            for row in self.db.get_all(ProcessTypeORM)
+        }
+        return [
+            Order(
+                id=row["id"],
+                name=row["name"],
+                sort_name=row["sort_name"] or 0,
+                process_type_id=row["process_type_id"],
+                process_type=process_types.get(row["process_type_id"], row["process_type_id"]),
+            )
+            for row in self.db.get_all(OrderORM, order_by="-name")
+        ]
+
+    def get_process_type(self, process_type_id: int) -> Optional[ProcessType]:
+        row = self.db.get_one(ProcessTypeORM, {"id": process_type_id})
+        return self._process_type_from_row(row) if row else None
+
+    def updated_at(self) -> Optional[datetime]:
+        row = self.db.get_one(MetaORM, {"key": self.UPDATED_AT_KEY})
+        if not row or not row["value"]:
+            return None
+        return datetime.fromisoformat(row["value"])
+
+    def is_stale(self) -> bool:
+        updated_at = self.updated_at()
+        return updated_at is None or (datetime.now() - updated_at).total_seconds() > self.MAX_AGE
+
+    def refresh(self) -> List[Order]:
+        """Загружает заказы и типы процессов с сервера и сохраняет локально.
+
+        Raises:
+            Exception: Если не удалось получить список заказов
+        """
+        orders = self.api.get_orders()
+        process_types = {
+            order.process_type.id: order.process_type
+            for order in orders if isinstance(order.process_type, ProcessType)
+        }
+        try:
+            for process_type in self.api.get_process_types():
+                known = process_types.get(process_type.id)
+                if known is None or (process_type.stages and not known.stages):
+                    process_types[process_type.id] = process_type
+        except Exception as e:
+            # Заказы уже получены, типы процессов обновятся в следующий раз
+            logger.Logger.warning(f"Catalog: process types are not refreshed: {e}")
+        self.save(orders, list(process_types.values()))
+        return orders
+
+    def save(self, orders: List[Order], process_types: List[ProcessType]) -> None:
+        """Заменяет локальный список заказов и обновляет типы процессов одной транзакцией"""
+        with self.db.unit_of_work():
+            self.save_process_types(process_types)
+            # Заказы, исчезнувшие с сервера, удаляются и локально
+            self.db.delete_many(OrderORM)
+            self.db.bulk_insert(OrderORM, [
+                {
+                    "id": order.id,
+                    "name": order.name,
+                    "sort_name": order.sort_name,
+                    "process_type_id": order.get_process_type_id(),
+                }
+                for order in orders
+            ])
+            self.db.upsert_many(MetaORM, [
+                {"key": self.UPDATED_AT_KEY, "value": datetime.now().isoformat()}
+            ])
+
+    def save_process_types(self, process_types: List[ProcessType]) -> None:
+        """Обновляет типы процессов; пустой список этапов не затирает сохранённый"""
+        self.db.upsert_many(ProcessTypeORM, [
+            {
+                "id": process_type.id,
+                "name": process_type.name,
+                "stages": json.dumps([stage.model_dump() for stage in process_type.stages]),
+            }
+            for process_type in process_types if process_type.stages
+        ])
+        self.db.upsert_many(ProcessTypeORM, [
+            {"id": process_type.id, "name": process_type.name}
+            for process_type in process_types if not process_type.stages
+        ])
+
+    @staticmethod
+    def _process_type_from_row(row: dict) -> ProcessType:
+        return ProcessType(
+            id=row["id"],
+            name=row["name"],
+            stages=json.loads(row.get("stages") or "[]"),
+        )
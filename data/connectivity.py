@@ -0,0 +1,153 @@
+"""
+Состояние связи с сервером
+
+Монитор складывает два источника сигналов: исходы настоящих запросов
+ApiClient (пассивно, без лишнего трафика) и дешёвую пробу сервера
+в отдельном потоке, которая выполняется, только если настоящих запросов
+давно не было. Состояние:
+    online   — сервер отвечает;
+    degraded — отвечает медленно или часть запросов падает;
+    offline  — OFFLINE_AFTER ошибок подряд; сканы сразу идут в очередь.
+
+Примеры использования:
+    monitor = get_connectivity_monitor()
+    monitor.start(api.probe)
+    monitor.add_listener(lambda state, previous: print(state))   # в главном потоке
+    monitor.record(ok=True, latency=0.12)
+    monitor.is_offline
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from kivy import logger
+
+from utils.ui_dispatch import dispatch_to_ui
+
+ONLINE = "online"
+DEGRADED = "degraded"
+OFFLINE = "offline"
+
+
+class ConnectivityMonitor:
+    # Ошибок подряд, после которых считаем сервер недоступным
+    OFFLINE_AFTER = 3
+    # Средняя задержка ответа, с которой связь считается плохой, секунды
+    DEGRADED_LATENCY = 2.0
+    # Доля ошибок среди последних WINDOW запросов для состояния degraded
+    DEGRADED_ERROR_RATE = 0.3
+    WINDOW = 20
+    MIN_SAMPLES = 5
+    # Период пробы: в офлайне чаще, чтобы быстрее заметить восстановление
+    PROBE_INTERVAL = 30.0
+    OFFLINE_PROBE_INTERVAL = 5.0
+
+    def __init__(self, dispatch: Callable = dispatch_to_ui):
+        self._dispatch = dispatch
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=self.WINDOW)
+        self._latencies = deque(maxlen=self.WINDOW)
+        self._failures_in_row = 0
+        self._last_signal = 0.0
+        self._state = ONLINE
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._probe = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def is_offline(self) -> bool:
+        return self._state == OFFLINE
+
+    def add_listener(self, listener: Callable[[str, str], None]) -> None:
+        """listener получает новое и прежнее состояние в главном потоке"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def record(self, ok: bool, latency: Optional[float] = None) -> None:
+        """Учитывает исход запроса к серверу"""
+        with self._lock:
+            self._last_signal = time.monotonic()
+            self._outcomes.append(ok)
+            if ok:
+                self._failures_in_row = 0
+                if latency is not None:
+                    self._latencies.append(latency)
+            else:
+                self._failures_in_row += 1
+            previous, self._state = self._state, self._evaluate()
+            listeners = list(self._listeners) if self._state != previous else []
+        if listeners:
+            logger.Logger.info(f"Connectivity: {previous} -> {self._state}")
+            for listener in listeners:
+                self._dispatch(listener, self._state, previous)
+
+    def _evaluate(self) -> str:
+        if self._failures_in_row >= self.OFFLINE_AFTER:
+            return OFFLINE
+        outcomes = self._outcomes
+        if len(outcomes) >= self.MIN_SAMPLES and outcomes.count(False) / len(outcomes) >= self.DEGRADED_ERROR_RATE:
+            return DEGRADED
+        if self._latencies and sum(self._latencies) / len(self._latencies) >= self.DEGRADED_LATENCY:
+            return DEGRADED
+        return ONLINE
+
+    def start(self, probe: Callable[[], bool]) -> None:
+        """Запускает фоновую пробу сервера.
+
+        Args:
+            probe: Выполняет дешёвый запрос и возвращает True, если сервер ответил
+        """
+        with self._lock:
+            self._probe = probe
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="connectivity", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop_event.set()
+        if thread is not None:
+            thread.join(1.0)
+
+    def _probe_interval(self) -> float:
+        return self.OFFLINE_PROBE_INTERVAL if self.is_offline else self.PROBE_INTERVAL
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self._probe_interval()):
+            # Свежий исход настоящего запроса лучше пробы
+            if time.monotonic() - self._last_signal < self._probe_interval():
+                continue
+            started = time.monotonic()
+            try:
+                ok = bool(self._probe())
+            except Exception as e:
+                logger.Logger.debug(f"Connectivity: probe failed: {e}")
+                ok = False
+            self.record(ok, time.monotonic() - started if ok else None)
+
+
+_monitor = None
+
+
+def get_connectivity_monitor() -> ConnectivityMonitor:
+    """Возвращает общий для приложения монитор связи"""
+    global _monitor
+    if _monitor is None:
+        _monitor = ConnectivityMonitor()
+    return _monitor
@@ -1,19 +1,55 @@
-import logging
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
 
 
 
 SQL_DB_URL = "sqlite:///db.sqlite3"
 
-# Включаем логирование SQL-запросов
-logging.basicConfig()
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
+# Профили SQLite: PRAGMA, которые выставляются каждому новому соединению
+ENGINE_PROFILES = {
+    # Настройки SQLite по умолчанию: журнал отката, fsync на каждый коммит
+    "default": {},
+    # WAL: чтение не блокирует запись из фонового потока, fsync на каждый коммит
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+    },
+    # WAL без fsync на каждый коммит: БД не повреждается, но при потере
+    # питания могут пропасть последние транзакции
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16000,  # в КиБ, около 16 МБ
+        "temp_store": "MEMORY",
+    },
+}
 
-engine = create_engine(
-    SQL_DB_URL,
-    connect_args={"check_same_thread": False}
-)
+DB_PROFILE = "throughput"
+# Логирование всех SQL-запросов (только для отладки)
+SQL_ECHO = False
+
+
+def make_engine(url: str = SQL_DB_URL, profile: str = DB_PROFILE, echo: bool = SQL_ECHO):
+    """Создаёт engine SQLite с PRAGMA выбранного профиля"""
+    pragmas = ENGINE_PROFILES[profile]
+    new_engine = create_engine(
+        url,
+        echo=echo,
+        connect_args={"check_same_thread": False}
+    )
+
+    @event.listens_for(new_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    return new_engine
+
+
+engine = make_engine()
 
 
 SessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
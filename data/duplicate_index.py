@@ -0,0 +1,60 @@
+"""
+Индекс дублей штрих-кодов в памяти
+
+Хранит коды только для активной пары (заказ, этап), поэтому проверка дубля
+при сканировании не обращается к SQLite, пока код точно новый. Совпадение
+в индексе лишь «возможное»: записи могли быть удалены в обход индекса
+(например, очисткой истории), поэтому его подтверждает запрос к БД.
+
+Примеры использования:
+    index = DuplicateIndex()
+    index.load(order_id, stage_id, codes)
+    index.might_contain("123", order_id, stage_id)  # True/False, None — индекс не загружен
+"""
+
+import threading
+from typing import Iterable, Optional
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self._key = None
+        self._codes = set()
+        self._lock = threading.Lock()
+
+    def load(self, order_id: int, stage_id: int, codes: Iterable[str]) -> None:
+        """Заменяет содержимое индекса кодами пары (заказ, этап)"""
+        codes = set(codes)
+        with self._lock:
+            self._key = (order_id, stage_id)
+            self._codes = codes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._key = None
+            self._codes = set()
+
+    def might_contain(self, code: str, order_id: int, stage_id: int) -> Optional[bool]:
+        """Проверяет код по индексу.
+
+        Returns:
+            False — кода точно нет, True — возможный дубль,
+            None — индекс загружен для другой пары
+        """
+        with self._lock:
+            if self._key != (order_id, stage_id):
+                return None
+            return code in self._codes
+
+    def add(self, code: str, order_id: int, stage_id: int) -> None:
+        with self._lock:
+            if self._key == (order_id, stage_id):
+                self._codes.add(code)
+
+    def discard(self, code: str, order_id: int, stage_id: int) -> None:
+        with self._lock:
+            if self._key == (order_id, stage_id):
+                self._codes.discard(code)
+
+    def __len__(self) -> int:
+        return len(self._codes)
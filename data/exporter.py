@@ -0,0 +1,187 @@
+"""
+Потоковый экспорт истории штрих-кодов
+
+Строки читаются из БД пачками через курсор и сразу пишутся в файл, поэтому
+расход памяти не зависит от количества записей. Поддерживаются форматы
+json (с отступами, как прежний экспорт), ndjson и csv, сжатие gzip и фильтры
+по заказу, этапу, диапазону дат и статусу отправки.
+
+Примеры использования:
+    exporter = BarcodeExporter(DatabaseService())
+    path = exporter.make_path("csv", compress=True)
+    exporter.export(path, "csv", compress=True, order=12, is_sent=False)
+"""
+
+import csv
+import gzip
+import json
+import os
+import textwrap
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from models.models import BarcodeORM
+from utils.background_task import TaskCancelled
+
+EXPORT_FIELDS = {
+    "Id": "id",
+    "Code": "code",
+    "CreatedAt": "created_at",
+    "User": "user_id",
+    "Order": "order",
+    "Stage": "stage",
+    "IsGood": "is_good",
+    "IsSent": "is_sent",
+    "ErrorCount": "error_count",
+}
+
+
+class BarcodeExporter:
+    FORMATS = ("json", "ndjson", "csv")
+    CHUNK_SIZE = 1000
+    # Сколько раз за экспорт обновлять прогресс, если известно число строк
+    PROGRESS_STEPS = 100
+
+    def __init__(self, db):
+        self.db = db
+        self._should_stop = None
+        self._step = self.CHUNK_SIZE
+
+    @staticmethod
+    def make_path(fmt: str, compress: bool = False, directory: str = "exports") -> str:
+        """Уникальное имя файла экспорта в directory"""
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        extension = f".{fmt}.gz" if compress else f".{fmt}"
+        path = os.path.join(directory, f"barcodes_export_{timestamp}{extension}")
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(directory, f"barcodes_export_{timestamp}_{counter}{extension}")
+            counter += 1
+        return path
+
+    @staticmethod
+    def _query(
+            order: Optional[int] = None,
+            stage: Optional[int] = None,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None,
+            is_sent: Optional[bool] = None
+    ):
+        filters = {}
+        if order is not None:
+            filters["order"] = order
+        if stage is not None:
+            filters["stage"] = stage
+        if is_sent is not None:
+            filters["is_sent"] = is_sent
+        conditions = []
+        if date_from is not None:
+            conditions.append(BarcodeORM.created_at >= date_from)
+        if date_to is not None:
+            conditions.append(BarcodeORM.created_at < date_to)
+        return filters, conditions
+
+    def count(self, **query) -> int:
+        filters, conditions = self._query(**query)
+        return self.db.count(BarcodeORM, filters, conditions)
+
+    def export(
+            self,
+            path: str,
+            fmt: str = "json",
+            compress: bool = False,
+            progress: Optional[Callable[[int], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None,
+            total: Optional[int] = None,
+            **query
+    ) -> int:
+        """Записывает выбранные строки в файл.
+
+        Args:
+            path: Путь к файлу
+            fmt: json, ndjson или csv
+            compress: Сжимать ли файл gzip
+            progress: Вызывается по ходу записи с числом записанных строк
+                и в конце с итоговым числом
+            should_stop: Проверяется вместе с progress; True прерывает экспорт
+                и удаляет недописанный файл
+            total: Ожидаемое число строк (count); прогресс обновляется каждые
+                total / PROGRESS_STEPS строк, без него — каждые CHUNK_SIZE
+            **query: order, stage, date_from, date_to, is_sent
+
+        Returns:
+            Количество записанных строк
+
+        Raises:
+            TaskCancelled: Если экспорт прерван через should_stop
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+        filters, conditions = self._query(**query)
+        rows = self.db.iter_rows(
+            BarcodeORM,
+            filters=filters,
+            conditions=conditions,
+            columns=list(EXPORT_FIELDS.values()),
+            chunk_size=self.CHUNK_SIZE,
+            raw=True,
+        )
+        opener = gzip.open if compress else open
+        writer = getattr(self, f"_write_{fmt}")
+        self._should_stop = should_stop
+        self._step = max(1, total // self.PROGRESS_STEPS) if total else self.CHUNK_SIZE
+        try:
+            with opener(path, "wt", encoding="utf-8", newline="") as file:
+                written = writer(file, (self._item(row) for row in rows), progress)
+        except TaskCancelled:
+            rows.close()
+            os.remove(path)
+            raise
+        if progress and written % self._step:
+            progress(written)
+        return written
+
+    @staticmethod
+    def _item(row: tuple) -> Dict[str, Any]:
+        item = dict(zip(EXPORT_FIELDS, row))
+        item["CreatedAt"] = item["CreatedAt"].isoformat() if item["CreatedAt"] else None
+        return item
+
+    def _report(self, progress, written: int) -> None:
+        if written % self._step:
+            return
+        if self._should_stop and self._should_stop():
+            raise TaskCancelled()
+        if progress:
+            progress(written)
+
+    def _write_json(self, file, items, progress) -> int:
+        written = 0
+        file.write("[")
+        for item in items:
+            file.write(",\n" if written else "\n")
+            file.write(textwrap.indent(json.dumps(item, indent=2, ensure_ascii=False, default=str), "  "))
+            written += 1
+            self._report(progress, written)
+        file.write("\n]\n" if written else "]\n")
+        return written
+
+    def _write_ndjson(self, file, items, progress) -> int:
+        written = 0
+        for item in items:
+            file.write(json.dumps(item, ensure_ascii=False, default=str))
+            file.write("\n")
+            written += 1
+            self._report(progress, written)
+        return written
+
+    def _write_csv(self, file, items, progress) -> int:
+        written = 0
+        writer = csv.DictWriter(file, fieldnames=list(EXPORT_FIELDS))
+        writer.writeheader()
+        for item in items:
+            writer.writerow(item)
+            written += 1
+            self._report(progress, written)
+        return written
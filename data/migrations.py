@@ -0,0 +1,159 @@
+"""
+Версионные миграции схемы локальной БД
+
+Номер применённой миграции хранится в PRAGMA user_version файла SQLite.
+При запуске приложения run_migrations применяет по порядку все миграции
+с номером больше текущего, каждую в своей транзакции, поэтому уже
+существующие db.sqlite3 обновляются на месте.
+
+Новая миграция — функция, принимающая Connection, добавленная в конец
+MIGRATIONS со следующим номером. Уже выпущенные миграции не изменяются.
+
+Примеры использования:
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+
+    # То же одним вызовом
+    prepare_schema(engine)
+
+    # Один раз за процесс: так DatabaseService готовит схему перед первой
+    # сессией, а приложение — заранее в фоновом потоке
+    ensure_schema(engine)
+"""
+
+import threading
+from typing import Callable, List, Tuple
+
+from kivy import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+def _barcode_indexes(conn: Connection) -> None:
+    """Индексы для проверки дублей, очереди отправки и истории"""
+    # Уникальный индекс не создастся, если дубли уже попали в БД. Из каждой
+    # тройки (code, order, stage) оставляем отправленную запись, а если таких
+    # нет — самую раннюю. Остальные сначала копируются в barcode_removed_duplicates.
+    # MIN(CASE ...) вместо оконных функций: их нет в SQLite старых Android
+    conn.execute(text(
+        'CREATE TEMP TABLE barcode_duplicate_keys AS '
+        'SELECT code, "order", stage, '
+        'COALESCE(MIN(CASE WHEN is_sent = 1 THEN id END), MIN(id)) AS keep_id '
+        'FROM barcode GROUP BY code, "order", stage HAVING COUNT(*) > 1'
+    ))
+    duplicates = (
+        'FROM barcode AS b JOIN barcode_duplicate_keys AS k '
+        'ON b.code = k.code AND b."order" = k."order" AND b.stage = k.stage '
+        'WHERE b.id != k.keep_id'
+    )
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS barcode_removed_duplicates AS SELECT * FROM barcode WHERE 0'
+    ))
+    backed_up = conn.execute(text(
+        f'INSERT INTO barcode_removed_duplicates SELECT b.* {duplicates}'
+    )).rowcount
+    unsent = conn.execute(text(f'SELECT COUNT(*) {duplicates} AND b.is_sent = 0')).scalar()
+    removed = conn.execute(text(
+        f'DELETE FROM barcode WHERE id IN (SELECT b.id {duplicates})'
+    )).rowcount
+    conn.execute(text('DROP TABLE barcode_duplicate_keys'))
+    if removed:
+        logger.Logger.warning(
+            f"Migrations: removed {removed} duplicate barcodes ({unsent} unsent), "
+            f"{backed_up} copied to barcode_removed_duplicates"
+        )
+
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_barcode_code_order_stage '
+        'ON barcode (code, "order", stage)'
+    ))
+    # Частичный индекс: в нём только неотправленные строки, поэтому он
+    # остаётся маленьким при любом объёме истории
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_barcode_unsent '
+        'ON barcode (id) WHERE is_sent = 0'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_barcode_order_created_at '
+        'ON barcode ("order", created_at)'
+    ))
+
+
+def _barcode_history_index(conn: Connection) -> None:
+    """Индекс для постраничной истории по всем заказам"""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_barcode_created_at '
+        'ON barcode (created_at)'
+    ))
+
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """ALTER TABLE ADD COLUMN, если create_all ещё не создал колонку"""
+    existing = {row[1] for row in conn.execute(text(f'PRAGMA table_info("{table}")'))}
+    if column not in existing:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+
+
+def _process_type_stages(conn: Connection) -> None:
+    """Этапы типа процесса для офлайн-справочника заказов"""
+    _add_column_if_missing(conn, "process_type", "stages", "VARCHAR DEFAULT '[]'")
+
+
+# (версия, описание, функция); номера идут подряд начиная с 1
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "barcode indexes", _barcode_indexes),
+    (2, "barcode history index", _barcode_history_index),
+    (3, "process type stages", _process_type_stages),
+]
+
+
+def get_schema_version(engine: Engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def run_migrations(engine: Engine) -> int:
+    """Применяет недостающие миграции.
+
+    Returns:
+        Версию схемы после применения
+    """
+    version = get_schema_version(engine)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            # PRAGMA не поддерживает параметры, number — целое из MIGRATIONS
+            conn.execute(text(f"PRAGMA user_version = {int(number)}"))
+        logger.Logger.info(f"Migrations: applied {number} ({description})")
+        version = number
+    return version
+
+
+def prepare_schema(engine: Engine) -> int:
+    """Создаёт недостающие таблицы и применяет миграции."""
+    from models.models import Base
+    Base.metadata.create_all(engine)
+    return run_migrations(engine)
+
+
+# Engine, для которых схема уже подготовлена в этом процессе
+_prepared_engines = set()
+_schema_lock = threading.Lock()
+
+
+def ensure_schema(engine: Engine) -> None:
+    """Готовит схему engine один раз за процесс.
+
+    Первый вызывающий поток выполняет prepare_schema, остальные ждут его
+    на блокировке; после этого проверка — одна операция над множеством.
+    При ошибке схема не считается готовой и следующий вызов повторит попытку.
+    """
+    if engine in _prepared_engines:
+        return
+    with _schema_lock:
+        if engine in _prepared_engines:
+            return
+        prepare_schema(engine)
+        _prepared_engines.add(engine)
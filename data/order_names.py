@@ -0,0 +1,59 @@
+"""
+Кэш названий заказов
+
+Общий для всех экранов словарь id заказа -> название. Заполняется пачками:
+из списка заказов, полученного с сервера, и одним запросом к OrderORM.
+Названия, которых нет локально, догружаются с сервера в фоновом потоке;
+неудачный запрос повторяется не раньше чем через RETRY_AFTER секунд.
+
+Примеры использования:
+    names = OrderNameCache()
+    names.update({1: "Заказ 1"})
+    names.get(1)                 # "Заказ 1"
+    names.display_name(2)        # "ID:2", пока название неизвестно
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class OrderNameCache:
+    RETRY_AFTER = 300.0
+
+    def __init__(self):
+        self._names: Dict[int, str] = {}
+        self._failed: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, order_id: int) -> Optional[str]:
+        return self._names.get(order_id)
+
+    def display_name(self, order_id: int) -> str:
+        return self._names.get(order_id) or f"ID:{order_id}"
+
+    def update(self, names: Dict[int, str]) -> None:
+        with self._lock:
+            for order_id, name in names.items():
+                if name:
+                    self._names[order_id] = name
+                    self._failed.pop(order_id, None)
+
+    def mark_failed(self, order_id: int) -> None:
+        with self._lock:
+            self._failed[order_id] = time.monotonic()
+
+    def missing(self, order_ids: Iterable[int]) -> List[int]:
+        """Возвращает id без названия, которые пора запросить снова"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                order_id for order_id in order_ids
+                if order_id not in self._names
+                and now - self._failed.get(order_id, -self.RETRY_AFTER) >= self.RETRY_AFTER
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names.clear()
+            self._failed.clear()
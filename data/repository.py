@@ -1,43 +1,148 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 
 from kivy import logger
-from kivy.app import App
-from kivy.clock import Clock
+from requests import RequestException
+from sqlalchemy.exc import IntegrityError
 
-from api.api_client import ApiClient
-from models.models import BarcodeORM
+from api.api_client import ApiClient, ApiError
+from models.models import BarcodeORM, OrderORM
+from data.catalog import OrderCatalog
+from data.connectivity import OFFLINE, get_connectivity_monitor
+from data.duplicate_index import DuplicateIndex
+from data.order_names import OrderNameCache
 from data.service import DatabaseService
-from models.barcode import Barcode
+from data.sync_worker import get_lookup_worker, get_sync_worker
+from models.barcode import BarcodeImportSchema, QueuedBarcode
+from models.order import Order
+from models.process_type import ProcessType
 
 from data.session import AppSession
+from utils.timings import timings
+
+
+# Коды ответа, при которых считаем, что сервер не поддерживает массовый импорт
+BULK_UNSUPPORTED_STATUSES = (404, 405, 501)
+# Ключ задания синхронизации в очереди SyncWorker: повторные запросы не дублируются
+SYNC_JOB_KEY = "sync"
+CATALOG_JOB_KEY = "catalog"
 
 
 class Repository:
-    def __init__(self):
-        self.db = DatabaseService()
-        self.api = ApiClient()
-        self._sync_event = None  # Для хранения события синхронизации
-
-    def save_and_send_barcode(self, barcode_data: dict):
-        # Проверка дубля
-        is_duplicate = self.barcode_exists(
-            barcode_data['code'],
-            barcode_data['order'],
-            barcode_data['stage']
-        )
-        if is_duplicate:
-            return {"success": False, "reason": "duplicate"}
+    # Размер пачки для массовой отправки через import-barcodes
+    SYNC_CHUNK_SIZE = 200
+    # Потоков для отправки по одному, если массовый импорт недоступен
+    # (не больше ApiClient.POOL_MAXSIZE соединений с сервером)
+    SYNC_WORKERS = 8
+    # Через сколько секунд снова пробовать массовый импорт после отказа сервера
+    BULK_RETRY_AFTER = 600
+    # BASE_URL -> time.monotonic(), до которого массовый импорт не пробуем
+    bulk_unsupported_until: Dict[str, float] = {}
+    # Подтверждать скан сразу после локальной записи, отправляя его в фоне
+    ASYNC_SEND = True
+    # Коды активной пары (заказ, этап), общий для всех экземпляров
+    duplicate_index = DuplicateIndex()
+    # Названия заказов, общие для всех экранов
+    order_names = OrderNameCache()
 
-        # Сохраняем
-        barcode_id = self.save_barcode(barcode_data)
-        if not barcode_id:
-            return {"success": False, "reason": "db_error"}
+    def __init__(self, db: Optional[DatabaseService] = None, api: Optional[ApiClient] = None):
+        # Приложение держит один экземпляр на сессию входа (data/services.py)
+        self.db = db or DatabaseService()
+        self.api = api or ApiClient()
+        self.catalog = OrderCatalog(self.db, self.api)
 
-        # Пытаемся отправить
-        success = self.send_barcode(barcode_data)
-        if success:
-            self.db.update(BarcodeORM, barcode_id, {"is_sent": True})
-        return {"success": success, "barcode_id": barcode_id}
+    def save_and_send_barcode(
+            self,
+            barcode_data: dict,
+            on_delivered: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        """Сохраняет штрих-код локально и отправляет его на сервер.
+
+        В режиме ASYNC_SEND возвращает результат сразу после записи в БД,
+        а отправка выполняется в фоновом потоке (outbox). Без связи
+        с сервером скан только сохраняется (offline: True) и уйдёт
+        с синхронизацией после восстановления связи.
+
+        Args:
+            barcode_data: словарь с данными штрих-кода
+            on_delivered: вызывается в главном потоке после попытки отправки
+                со словарём barcode_id и delivered
+        """
+        with timings.span("repo.save_and_send"):
+            # Проверка дубля
+            is_duplicate = self.barcode_exists(
+                barcode_data['code'],
+                barcode_data['order'],
+                barcode_data['stage']
+            )
+            if is_duplicate:
+                return {"success": False, "reason": "duplicate"}
+
+            # Сохраняем
+            try:
+                barcode_id = self.save_barcode(barcode_data)
+            except Exception as e:
+                # У ошибок SQLAlchemy текст драйвера в orig, без SQL и ссылки на документацию
+                error = str(getattr(e, "orig", None) or e)
+                if isinstance(e, IntegrityError) and "UNIQUE" in error:
+                    # Уникальный индекс (code, order, stage): код записан в обход индекса
+                    # дублей, например, другим экраном или до загрузки индекса
+                    self.duplicate_index.add(barcode_data['code'], barcode_data['order'], barcode_data['stage'])
+                    return {"success": False, "reason": "duplicate"}
+                logger.Logger.error(f"Repository: saving barcode failed: {error}")
+                return {"success": False, "reason": "db_error", "error": error}
+
+            if get_connectivity_monitor().is_offline:
+                return {"success": True, "barcode_id": barcode_id, "queued": True, "offline": True}
+
+            if self.ASYNC_SEND:
+                self.enqueue_send(barcode_id, barcode_data, on_delivered)
+                return {"success": True, "barcode_id": barcode_id, "queued": True}
+
+            # Пытаемся отправить
+            success = self.send_barcode(barcode_data)
+            if success:
+                self._record_results([barcode_id], [])
+            return {"success": success, "barcode_id": barcode_id}
+
+    def enqueue_send(
+            self,
+            barcode_id: int,
+            barcode_data: dict,
+            on_delivered: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> None:
+        """Передаёт сохранённый штрих-код в очередь фоновой отправки.
+
+        Запись уже лежит в БД с is_sent=False, поэтому при неудаче её
+        отправит следующая синхронизация.
+        """
+        worker = get_sync_worker()
+        worker.start()
+        worker.submit(
+            self._deliver,
+            barcode_id,
+            self._barcode_payload(barcode_data),
+            timings.now(),
+            callback=on_delivered,
+        )
+
+    def _deliver(self, barcode_id: int, payload: dict, queued_at: Optional[float] = None) -> Dict[str, Any]:
+        """Отправляет один штрих-код из outbox (выполняется в SyncWorker)"""
+        # Сколько скан ждал в очереди за синхронизацией и другими заданиями
+        timings.record_since("outbox.wait", queued_at)
+        # Синхронизация, стоявшая в очереди раньше, могла уже отправить строку,
+        # а пользователь — удалить её из истории
+        is_sent = self.db.get_values(BarcodeORM, "is_sent", {"id": barcode_id})
+        if not is_sent:
+            return {"barcode_id": barcode_id, "delivered": False}
+        if is_sent[0]:
+            return {"barcode_id": barcode_id, "delivered": True}
+        delivered = self.send_barcode(payload)
+        if delivered:
+            self._record_results([barcode_id], [])
+        return {"barcode_id": barcode_id, "delivered": delivered}
 
     def is_barcode_exists(self, code, order, stage):
         # Можно добавить is_good, user_id, если нужно
@@ -50,12 +155,29 @@ class Repository:
     def barcode_exists(self, code, order_id, stage_id):
         """
         Проверяет, есть ли уже такой штрихкод для заказа+этапа.
+
+        Сначала смотрит в индекс в памяти; в SQLite идёт только при возможном
+        совпадении или если индекс загружен для другой пары.
         """
+        if self.duplicate_index.might_contain(code, order_id, stage_id) is False:
+            return False
         return self.db.exists(
             BarcodeORM,
             {"code": code, "order": order_id, "stage": stage_id}
         )
 
+    def load_duplicate_index(self, order_id: int, stage_id: int) -> int:
+        """Загружает в индекс дублей коды выбранной пары (заказ, этап).
+
+        Returns:
+            Количество загруженных кодов
+        """
+        codes = self.db.get_values(
+            BarcodeORM, "code", {"order": order_id, "stage": stage_id}
+        )
+        self.duplicate_index.load(order_id, stage_id, codes)
+        return len(self.duplicate_index)
+
     def send_barcode(self, data: dict):
         """Отправляет штрих-код на сервер.
         Args:
@@ -81,59 +203,369 @@ class Repository:
 
         Returns:
             int: ID сохраненной записи
+
+        Raises:
+            IntegrityError: Если такой код уже есть для заказа и этапа
         """
-        try:
-            return self.db.insert(BarcodeORM, barcode_data)
-        except Exception as e:
-            print(f"Error saving to database: {str(e)}")
-            return None
+        barcode_id = self.db.insert(BarcodeORM, barcode_data)
+        self.duplicate_index.add(
+            barcode_data['code'], barcode_data['order'], barcode_data['stage']
+        )
+        return barcode_id
+
+    def delete_barcode(self, barcode_id: int) -> bool:
+        """Удаляет штрих-код из БД и из индекса дублей"""
+        row = self.db.get_one(BarcodeORM, {"id": barcode_id})
+        if not row:
+            return False
+        deleted = self.db.delete(BarcodeORM, barcode_id)
+        if deleted:
+            self.duplicate_index.discard(row["code"], row["order"], row["stage"])
+        return deleted
+
 
+    @staticmethod
+    def _barcode_payload(row: dict) -> dict:
+        """Собирает из строки БД данные для отправки одного штрих-кода"""
+        return {field: row[field] for field in BarcodeImportSchema.model_fields}
 
-    def sync_barcode(self):
-        """Синхронизирует неотправленные штрих-коды с API.
+    @staticmethod
+    def _parse_bulk_results(response, count: int) -> List[bool]:
+        """Сопоставляет ответ import-barcodes с отправленными элементами.
 
         Args:
-            max_retries: Максимальное количество попыток для одного штрих-кода
+            response: JSON-ответ сервера
+            count: Количество отправленных элементов
+
+        Returns:
+            Список флагов успеха в порядке отправки
+
+        Raises:
+            ValueError: Если по ответу нельзя понять результат каждого элемента
+        """
+        if isinstance(response, dict):
+            items = response.get("results", response.get("items"))
+            if items is None:
+                if "success" not in response:
+                    raise ValueError(f"Неизвестный формат ответа: {response}")
+                return [bool(response["success"])] * count
+        else:
+            items = response
+
+        if not isinstance(items, list) or len(items) != count:
+            raise ValueError("Количество результатов не совпадает с количеством штрих-кодов")
+
+        results = []
+        for item in items:
+            if isinstance(item, dict):
+                results.append(bool(item.get("success", not item.get("error"))))
+            else:
+                results.append(bool(item))
+        return results
+
+    def _record_results(self, sent_ids: List[int], failed_ids: List[int]) -> None:
+        """Фиксирует результат отправки одной транзакцией.
+
+        Отправленные помечаются is_sent со сбросом error_count,
+        у неотправленных увеличивается error_count.
         """
-        unsynced = self.db.get_unsynced_barcodes()
+        with self.db.unit_of_work():
+            if sent_ids:
+                self.db.bulk_update(BarcodeORM, sent_ids, {"is_sent": True, "error_count": 0})
+            if failed_ids:
+                self.db.increment(BarcodeORM, failed_ids, "error_count")
+
+    def _send_chunk(
+            self,
+            chunk: List[QueuedBarcode],
+            pool: Optional[ThreadPoolExecutor] = None
+    ) -> List[bool]:
+        """Отправляет пачку штрих-кодов и возвращает результат по каждой строке.
+
+        Сначала пробует массовый эндпоинт, при его отсутствии или отказе
+        отправляет элементы по одному, параллельно в pool, если он передан.
 
-        for barcode_orm in unsynced:
-            barcode = Barcode.model_validate(barcode_orm)
+        Raises:
+            RequestException: Если сервер недоступен
+        """
+        if self.bulk_supported:
+            response = None
             try:
-                # Отправляем в API
-                self.api.create_barcode(barcode)
-                # Обновляем статус в БД
-                self.db.update(
-                    BarcodeORM,
-                    barcode_orm.id,
-                    {"is_sent": True}
+                response = self.api.sent_barcodes(chunk)
+                return self._parse_bulk_results(response, len(chunk))
+            except ApiError as e:
+                if e.status_code in BULK_UNSUPPORTED_STATUSES:
+                    self.bulk_unsupported_until[self.api.BASE_URL] = time.monotonic() + self.BULK_RETRY_AFTER
+                    logger.Logger.warning(
+                        f"Sync: bulk import is not supported, using per-item sends "
+                        f"for {self.BULK_RETRY_AFTER} s"
+                    )
+                else:
+                    logger.Logger.warning(f"Sync: bulk import rejected chunk: {e}")
+            except ValueError as e:
+                # Сервер ответил 2xx, и строки, скорее всего, уже приняты: повтор по одному
+                # получит 409, а create_barcode считает его доставкой
+                logger.Logger.warning(f"Sync: unexpected bulk import reply ({e}): {str(response)[:500]}")
+
+        if pool is not None:
+            # map сохраняет порядок строк, статусы фиксируются одной транзакцией после пачки
+            return list(pool.map(self._send_item, chunk))
+        results = []
+        for row in chunk:
+            if self.api.breaker.is_open:
+                # Сервер перестал отвечать — остаток пачки не ждёт таймаутов
+                logger.Logger.warning("Sync: server is unavailable, skipping the rest of the chunk")
+                results.extend([False] * (len(chunk) - len(results)))
+                break
+            results.append(self.send_barcode(row.import_payload()))
+        return results
+
+    @property
+    def bulk_supported(self) -> bool:
+        """Пробовать ли массовый импорт на сервере текущего ApiClient"""
+        return time.monotonic() >= self.bulk_unsupported_until.get(self.api.BASE_URL, 0)
+
+    def _send_item(self, row: QueuedBarcode) -> bool:
+        if self.api.breaker.is_open:
+            return False
+        return self.send_barcode(row.import_payload())
+
+    def sync_barcode(
+            self,
+            chunk_size: Optional[int] = None,
+            progress: Optional[Callable[[int, int], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None,
+            workers: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Синхронизирует неотправленные штрих-коды с API пачками.
+
+        Args:
+            chunk_size: Размер пачки (по умолчанию SYNC_CHUNK_SIZE)
+            progress: Вызывается после каждой пачки с (обработано, всего)
+            should_stop: Проверяется перед каждой пачкой; True прерывает синхронизацию
+            workers: Потоков для отправки по одному (по умолчанию SYNC_WORKERS)
+
+        Returns:
+            Словарь со счётчиками sent, failed и total
+        """
+        chunk_size = chunk_size or self.SYNC_CHUNK_SIZE
+        unsynced = [
+            QueuedBarcode(*row)
+            for row in self.db.get_rows(BarcodeORM, QueuedBarcode.COLUMNS, {"is_sent": False})
+        ]
+        total = len(unsynced)
+        stats = {"sent": 0, "failed": 0, "total": total}
+
+        workers = workers or self.SYNC_WORKERS
+        # Потоки создаются, только если дойдёт до отправки по одному
+        pool = ThreadPoolExecutor(workers, thread_name_prefix="sync-item") if workers > 1 else None
+        try:
+            for start in range(0, total, chunk_size):
+                if should_stop and should_stop():
+                    break
+                chunk = unsynced[start:start + chunk_size]
+                aborted = False
+                try:
+                    results = self._send_chunk(chunk, pool)
+                except RequestException as e:
+                    # Сервер недоступен — остальные пачки отправлять бессмысленно
+                    logger.Logger.error(f"Sync aborted: {e}")
+                    results = [False] * len(chunk)
+                    aborted = True
+
+                sent_ids = [row.id for row, ok in zip(chunk, results) if ok]
+                failed_ids = [row.id for row, ok in zip(chunk, results) if not ok]
+                self._record_results(sent_ids, failed_ids)
+                stats["sent"] += len(sent_ids)
+                stats["failed"] += len(chunk) - len(sent_ids)
+                logger.Logger.info(
+                    f"Sync: chunk {start // chunk_size + 1}: sent {len(sent_ids)} of {len(chunk)}"
                 )
-                logger.Logger.info(f"Successfully synced barcode {barcode_orm.id}")
+                if progress:
+                    progress(start + len(chunk), total)
+                if aborted:
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+        return stats
+
+    def resend_barcode(self, barcode_id: int) -> Dict[str, Any]:
+        """Повторно отправляет один штрих-код из локальной БД.
+
+        Returns:
+            Словарь с success и текстом сообщения для пользователя
+        """
+        row = self.db.get_one(BarcodeORM, {"id": barcode_id})
+        if not row:
+            return {"success": False, "message": "Не найден в БД"}
+        try:
+            success = self.send_barcode(self._barcode_payload(row))
+        except Exception as e:
+            success = False
+            message = f"Ошибка: {str(e)}"
+        else:
+            message = "Успешно отправлено" if success else "Ошибка при отправке"
+        if success:
+            self._record_results([barcode_id], [])
+        else:
+            self._record_results([], [barcode_id])
+        return {"success": success, "message": message}
+
+    def get_unsynced_summary(self) -> Dict[int, int]:
+        """Количество неотправленных штрих-кодов по заказам одним GROUP BY"""
+        return self.db.count_by(BarcodeORM, "order", {"is_sent": False})
+
+    def resolve_order_names(
+            self,
+            order_ids: List[int],
+            callback: Optional[Callable[[Dict[int, str]], None]] = None
+    ) -> bool:
+        """Догружает в фоне названия заказов, которых нет в кэше.
+
+        Returns:
+            True, если понадобился фоновый запрос; callback получит
+            найденные названия в главном потоке
+        """
+        missing = self.order_names.missing(order_ids)
+        if not missing:
+            return False
+        worker = get_lookup_worker()
+        worker.start()
+        worker.submit(self._load_order_names, missing, callback=callback)
+        return True
+
+    def _load_order_names(self, order_ids: List[int]) -> Dict[int, str]:
+        """Ищет названия в OrderORM одним запросом, остальные — на сервере"""
+        names = {
+            row["id"]: row["name"]
+            for row in self.db.get_by_ids(OrderORM, order_ids)
+        }
+        for order_id in order_ids:
+            if order_id in names:
+                continue
+            try:
+                api_order = self.api.get_order_by_id(order_id)
+                if api_order and api_order.get("name"):
+                    names[order_id] = api_order["name"]
+                    continue
             except Exception as e:
-                # Логируем ошибку и увеличиваем счетчик
-                logger.Logger.error(f"Failed to sync barcode {barcode_orm.id}: {str(e)}")
-                self.db.update(
-                    BarcodeORM,
-                    barcode_orm.id,
-                    {"error_count": barcode_orm.error_count +1}
-                )
+                logger.Logger.warning(f"Order name {order_id}: {e}")
+            self.order_names.mark_failed(order_id)
+        self.order_names.update(names)
+        return names
+
+    def get_local_orders(self) -> List[Order]:
+        """Заказы из локального справочника, без обращения к серверу"""
+        orders = self.catalog.load_local()
+        self.order_names.update({order.id: order.name for order in orders})
+        return orders
+
+    def refresh_orders(
+            self,
+            callback: Optional[Callable[[List[Order]], None]] = None,
+            error_callback: Optional[Callable[[Exception], None]] = None
+    ) -> bool:
+        """Обновляет справочник заказов с сервера в фоновом потоке.
+
+        Returns:
+            False, если обновление уже стоит в очереди
+        """
+        worker = get_lookup_worker()
+        worker.start()
+        return worker.submit(
+            self._refresh_orders,
+            callback=callback,
+            error_callback=error_callback,
+            key=CATALOG_JOB_KEY,
+        )
+
+    def _refresh_orders(self) -> List[Order]:
+        self.catalog.refresh()
+        return self.get_local_orders()
+
+    def get_cached_process_type(self, process_type_id: int) -> Optional[ProcessType]:
+        """Тип процесса с этапами без обращения к сети.
+
+        Берётся из AppSession.stages_cache, иначе из локального справочника
+        (тогда в фоне запускается обновление с сервера).
+        """
+        process_type = AppSession.stages_cache.get(process_type_id)
+        if process_type is not None:
+            return process_type
+        process_type = self.catalog.get_process_type(process_type_id)
+        if process_type is None or not process_type.stages:
+            return None
+        AppSession.stages_cache.put(process_type_id, process_type)
+        self.prefetch_stages(process_type_id)
+        return process_type
+
+    def prefetch_stages(
+            self,
+            process_type_id: int,
+            callback: Optional[Callable[[ProcessType], None]] = None,
+            error_callback: Optional[Callable[[Exception], None]] = None
+    ) -> bool:
+        """Загружает этапы типа процесса в кэш в фоновом потоке"""
+        worker = get_lookup_worker()
+        worker.start()
+        return worker.submit(
+            self._load_process_type,
+            process_type_id,
+            callback=callback,
+            error_callback=error_callback,
+            # Без колбэка повторная предзагрузка того же типа не нужна
+            key=None if callback else f"stages:{process_type_id}",
+        )
+
+    def _load_process_type(self, process_type_id: int) -> ProcessType:
+        """Получает тип процесса с сервера, при ошибке — из справочника"""
+        try:
+            process_type = self.api.get_process_type(process_type_id)
+        except Exception as e:
+            process_type = self.catalog.get_process_type(process_type_id)
+            if process_type is None or not process_type.stages:
+                raise
+            logger.Logger.warning(f"Stages {process_type_id}: using local copy: {e}")
+        else:
+            self.catalog.save_process_types([process_type])
+        AppSession.stages_cache.put(process_type_id, process_type)
+        return process_type
 
     def start_auto_sync(self, interval: float = 60.0) -> None:
-        """Запускает периодическую синхронизацию.
+        """Запускает периодическую синхронизацию и монитор связи.
+
+        Пока сервер недоступен, периодическая синхронизация пропускается;
+        накопленные сканы отправляются сразу после восстановления связи.
 
         Args:
             interval: Интервал синхронизации в секундах
         """
-        self.stop_auto_sync()  # Останавливаем предыдущую синхронизацию
-        self._sync_event = Clock.schedule_interval(
-            lambda dt: self.sync_barcode(), interval
-        )
+        worker = get_sync_worker()
+        worker.start()
+        worker.schedule_periodic(self._auto_sync, interval, key=SYNC_JOB_KEY)
+        monitor = get_connectivity_monitor()
+        monitor.add_listener(self._on_connectivity_changed)
+        monitor.start(self.api.probe)
 
     def stop_auto_sync(self) -> None:
-        """Останавливает периодическую синхронизацию."""
-        if self._sync_event:
-            self._sync_event.cancel()
-            self._sync_event = None
+        """Останавливает периодическую синхронизацию и монитор связи."""
+        get_sync_worker().cancel_periodic()
+        monitor = get_connectivity_monitor()
+        monitor.remove_listener(self._on_connectivity_changed)
+        monitor.stop()
+
+    def _auto_sync(self) -> Optional[Dict[str, int]]:
+        if get_connectivity_monitor().is_offline:
+            return None
+        return self.sync_barcode()
+
+    def _on_connectivity_changed(self, state: str, previous: str) -> None:
+        if previous == OFFLINE and state != OFFLINE:
+            logger.Logger.info("Sync: connection restored, sending queued barcodes")
+            worker = get_sync_worker()
+            worker.start()
+            worker.submit(self.sync_barcode, key=SYNC_JOB_KEY)
 
     def delete_many(self, model, filters=None):
         """Удаляет несколько записей по фильтру и возвращает количество удаленных"""
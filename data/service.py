@@ -16,28 +16,51 @@
 
     # Чтение данных
     unsynced_barcodes = db_service.get_all(BarcodeORM, filters={"is_sent": False})
+
+    # Массовое обновление в одной транзакции
+    with db_service.unit_of_work():
+        db_service.bulk_update(BarcodeORM, [1, 2, 3], {"is_sent": True})
+        db_service.increment(BarcodeORM, [4], "error_count")
 """
 
+import threading
 from contextlib import contextmanager
-from typing import Type, Any, Dict, List, Optional, TypeVar, Union
+from typing import Type, Any, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import inspect
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, inspect, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from data.db import SessionLocal
+from data.migrations import ensure_schema
 from models.models import Base, BarcodeORM
+from utils.timings import timings
 
 
 T = TypeVar('T', bound=Base)
 
 
 class DatabaseService:
-    def __init__(self):
-        self.session_local =SessionLocal
+    # Ограничение числа параметров в одном IN (...) для старых сборок SQLite
+    IN_CHUNK_SIZE = 500
+
+    def __init__(self, session_local=None):
+        # session_local позволяет работать с другой БД (бенчмарки, временные файлы)
+        self.session_local = session_local or SessionLocal
+        self._local = threading.local()
 
     @contextmanager
     def _session_scope(self) -> Session:
         """Контекстный менеджер для безопасной работы с сессиями"""
+        active = getattr(self._local, "session", None)
+        if active is not None:
+            # Внутри unit_of_work: коммит выполнит внешний блок
+            yield active
+            return
+        # Схема готовится один раз за процесс: при запуске приложения — заранее
+        # в фоновом потоке, в скриптах — перед первой сессией
+        bind = self.session_local.kw.get("bind") if hasattr(self.session_local, "kw") else None
+        if bind is not None:
+            ensure_schema(bind)
         session = self.session_local()
         try:
             yield session
@@ -48,9 +71,28 @@ class DatabaseService:
         finally:
             session.close()
 
+    @contextmanager
+    def unit_of_work(self):
+        """Выполняет все операции сервиса внутри блока в одной транзакции.
+
+        Пример:
+            with db.unit_of_work():
+                db.bulk_update(BarcodeORM, sent_ids, {"is_sent": True})
+                db.increment(BarcodeORM, failed_ids, "error_count")
+        """
+        if getattr(self._local, "session", None) is not None:
+            yield self
+            return
+        with self._session_scope() as session:
+            self._local.session = session
+            try:
+                yield self
+            finally:
+                self._local.session = None
+
     def insert(self, model: Type[T], data: Union[Dict[str, Any], T]) -> int:
         """Добавление новой записи"""
-        with self._session_scope() as session:
+        with timings.span("db.insert"), self._session_scope() as session:
             obj = model(**data)
             session.add(obj)
             session.flush()
@@ -117,9 +159,35 @@ class DatabaseService:
             query = session.query(model)
             if filters:
                 query = query.filter_by(**filters)
-            count = query.count()  # Получаем количество перед удалением
-            query.delete(synchronize_session=False)
-            return count
+            return query.delete(synchronize_session=False)
+
+    def _id_chunks(self, ids: List[int]):
+        ids = list(ids)
+        for start in range(0, len(ids), self.IN_CHUNK_SIZE):
+            yield ids[start:start + self.IN_CHUNK_SIZE]
+
+    def bulk_update(self, model: Type[T], ids: List[int], values: Dict[str, Any]) -> int:
+        """Обновляет записи с указанными id одним UPDATE ... WHERE id IN (...)
+
+        Returns:
+            Количество обновлённых строк
+        """
+        count = 0
+        with self._session_scope() as session:
+            for chunk in self._id_chunks(ids):
+                count += session.query(model).filter(model.id.in_(chunk)).update(
+                    values, synchronize_session=False
+                )
+        return count
+
+    def increment(self, model: Type[T], ids: List[int], column: str, amount: int = 1) -> int:
+        """Увеличивает счётчик column у записей с указанными id одним UPDATE
+
+        Returns:
+            Количество обновлённых строк
+        """
+        attr = getattr(model, column)
+        return self.bulk_update(model, ids, {column: func.coalesce(attr, 0) + amount})
 
     def get_columns(self, model: Type[Base]) -> List[str]:
         """Получение списка колонок модели"""
@@ -131,6 +199,151 @@ class DatabaseService:
             obj = session.query(model).filter_by(**filters).first()
             return self.orm_to_dict(obj) if obj else None
 
+    def get_by_ids(self, model: Type[T], ids: List[int]) -> List[dict]:
+        """Получение записей по списку id"""
+        results = []
+        with self._session_scope() as session:
+            for chunk in self._id_chunks(ids):
+                results.extend(
+                    self.orm_to_dict(obj)
+                    for obj in session.query(model).filter(model.id.in_(chunk))
+                )
+        return results
+
+    def get_values(self, model: Type[T], column: str, filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Получение значений одной колонки без создания ORM-объектов"""
+        with self._session_scope() as session:
+            query = session.query(getattr(model, column))
+            if filters:
+                query = query.filter_by(**filters)
+            return [value for (value,) in query]
+
+    def get_keyset_page(
+            self,
+            model: Type[T],
+            filters: Optional[Dict[str, Any]] = None,
+            cursor: Optional[Tuple[Any, int]] = None,
+            limit: int = 100,
+            newer: bool = False,
+            sort_column: str = "created_at",
+            columns: Optional[List[str]] = None,
+            raw: bool = False
+    ) -> List[Any]:
+        """Страница записей от новых к старым по ключу (sort_column, id).
+
+        Вместо OFFSET используется курсор — значение ключа крайней строки
+        предыдущей страницы, поэтому время запроса не зависит от глубины.
+
+        Args:
+            cursor: (sort_column, id) последней строки предыдущей страницы
+            newer: Вернуть строки новее курсора (прокрутка вверх)
+            columns: Загружаемые колонки (по умолчанию все)
+            raw: Вернуть кортежи значений columns вместо словарей
+
+        Returns:
+            Список словарей (или кортежей), всегда от новых к старым
+        """
+        sort_attr = getattr(model, sort_column)
+        id_attr = model.id
+        columns = columns or self.get_columns(model)
+        with self._session_scope() as session:
+            query = session.query(*[getattr(model, name) for name in columns])
+            if filters:
+                query = query.filter_by(**filters)
+            if cursor is not None:
+                value, row_id = cursor
+                if newer:
+                    query = query.filter(
+                        sort_attr >= value,
+                        or_(sort_attr > value, id_attr > row_id)
+                    )
+                else:
+                    query = query.filter(
+                        sort_attr <= value,
+                        or_(sort_attr < value, id_attr < row_id)
+                    )
+            if newer:
+                query = query.order_by(sort_attr.asc(), id_attr.asc())
+            else:
+                query = query.order_by(sort_attr.desc(), id_attr.desc())
+            rows = query.limit(limit).all()
+            if not raw:
+                rows = [dict(zip(columns, row)) for row in rows]
+        if newer:
+            rows.reverse()
+        return rows
+
+    def count_by(
+            self,
+            model: Type[T],
+            column: str,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[Any, int]:
+        """Количество записей по значениям колонки (GROUP BY)"""
+        attr = getattr(model, column)
+        with self._session_scope() as session:
+            query = session.query(attr, func.count())
+            if filters:
+                query = query.filter_by(**filters)
+            return dict(query.group_by(attr).all())
+
+    def count(
+            self,
+            model: Type[T],
+            filters: Optional[Dict[str, Any]] = None,
+            conditions: Optional[List[Any]] = None
+    ) -> int:
+        """Количество записей по фильтру и дополнительным условиям"""
+        with self._session_scope() as session:
+            query = session.query(func.count(model.id))
+            if filters:
+                query = query.filter_by(**filters)
+            if conditions:
+                query = query.filter(*conditions)
+            return query.scalar()
+
+    def iter_rows(
+            self,
+            model: Type[T],
+            filters: Optional[Dict[str, Any]] = None,
+            conditions: Optional[List[Any]] = None,
+            columns: Optional[List[str]] = None,
+            chunk_size: int = 1000,
+            raw: bool = False
+    ) -> Iterator[Any]:
+        """Потоково читает записи в порядке id, держа в памяти не больше chunk_size строк.
+
+        Args:
+            conditions: Дополнительные выражения SQLAlchemy (например, диапазон дат)
+            raw: Отдавать кортежи значений columns вместо словарей
+        """
+        columns = columns or self.get_columns(model)
+        statement = select(*[getattr(model, name) for name in columns]).order_by(model.id)
+        if filters:
+            statement = statement.filter_by(**filters)
+        if conditions:
+            statement = statement.where(*conditions)
+        with self._session_scope() as session:
+            result = session.execute(statement.execution_options(yield_per=chunk_size))
+            if raw:
+                yield from result
+            else:
+                for row in result:
+                    yield dict(zip(columns, row))
+
+    def get_rows(
+            self,
+            model: Type[T],
+            columns: List[str],
+            filters: Optional[Dict[str, Any]] = None
+    ) -> List[tuple]:
+        """Кортежи значений columns в порядке id, без создания ORM-объектов"""
+        statement = select(*[getattr(model, name) for name in columns]).order_by(model.id)
+        if filters:
+            statement = statement.filter_by(**filters)
+        with self._session_scope() as session:
+            return [tuple(row) for row in session.execute(statement)]
+
     def get_unsynced_barcodes(self):
         """Получение всех несинхронизированных штрих-кодов"""
         with self._session_scope() as session:
@@ -144,9 +357,30 @@ class DatabaseService:
             session.flush()
             return [obj.id for obj in objects if hasattr(obj, 'id')]
 
+    def upsert_many(self, model: Type[T], data_list: List[Dict[str, Any]]) -> int:
+        """Вставка или обновление записей по первичному ключу (INSERT ... ON CONFLICT)"""
+        if not data_list:
+            return 0
+        table = model.__table__
+        key_columns = [column.name for column in table.primary_key.columns]
+        with self._session_scope() as session:
+            statement = sqlite_insert(table)
+            update_columns = {
+                name: statement.excluded[name]
+                for name in data_list[0] if name not in key_columns
+            }
+            if update_columns:
+                statement = statement.on_conflict_do_update(
+                    index_elements=key_columns, set_=update_columns
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=key_columns)
+            session.execute(statement, data_list)
+        return len(data_list)
+
     def exists(self, model: Type[T], filters: Dict[str, Any]) -> bool:
         """Проверка существования записи"""
-        with self._session_scope() as session:
+        with timings.span("db.exists"), self._session_scope() as session:
             return session.query(
                 session.query(model).filter_by(**filters).exists()
             ).scalar()
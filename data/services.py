@@ -0,0 +1,55 @@
+"""
+Общие сервисы приложения
+
+Один Repository на всё время работы приложения: одна requests.Session
+с пулом соединений и cookies входа и один DatabaseService. Контейнер
+создаёт MyApp и передаёт экранам через свойство services; при выходе
+из учётной записи контейнер сбрасывается, и следующий вход начинается
+с новой HTTP-сессии.
+
+Примеры использования:
+    services = AppServices()
+    services.repository.save_and_send_barcode(data)   # тёплое соединение
+    services.api.login(username, password)            # то же, что repository.api
+    services.reset()                                  # выход из учётной записи
+"""
+
+import threading
+
+
+class AppServices:
+    def __init__(self):
+        self._repository = None
+        self._lock = threading.Lock()
+
+    @property
+    def repository(self):
+        """Repository, создаётся при первом обращении"""
+        if self._repository is None:
+            with self._lock:
+                if self._repository is None:
+                    # Слой данных импортируется после первого кадра (см. main.py)
+                    from data.repository import Repository
+                    self._repository = Repository()
+        return self._repository
+
+    @property
+    def db(self):
+        return self.repository.db
+
+    @property
+    def api(self):
+        return self.repository.api
+
+    def reset(self) -> None:
+        """Останавливает фоновую синхронизацию и закрывает HTTP-сессию.
+
+        Следующее обращение к repository создаст новый клиент без
+        cookies и CSRF-токена прежнего пользователя.
+        """
+        with self._lock:
+            repository, self._repository = self._repository, None
+        if repository is None:
+            return
+        repository.stop_auto_sync()
+        repository.api.close()
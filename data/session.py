@@ -1,10 +1,14 @@
+from utils.ttl_cache import TTLCache
+
+
 class AppSession:
     user = None
     permissions = []
     order = None
     stage = None
     csrf_token = None
-    stages_cache = {}
+    # Типы процессов с этапами по process_type_id
+    stages_cache = TTLCache(maxsize=32, ttl=600)
 
     @classmethod
     def clear(cls):
@@ -13,4 +17,4 @@ class AppSession:
         cls.permissions = []
         cls.stage = None
         cls.csrf_token = None
-        cls.stages_cache = {}
\ No newline at end of file
+        cls.stages_cache.clear()
@@ -0,0 +1,221 @@
+"""
+Фоновый поток синхронизации
+
+Все сетевые вызовы и записи в SQLite, связанные с отправкой штрих-кодов,
+выполняются в одном долгоживущем потоке с очередью заданий. Результаты
+возвращаются в UI только через Clock.schedule_once.
+
+Запросы, которых ждёт пользователь (этапы заказа, справочник заказов,
+названия заказов), идут в отдельную очередь get_lookup_worker() с двумя
+потоками и не стоят за синхронизацией и отправкой сканов.
+
+Примеры использования:
+    worker = get_sync_worker()
+    worker.start()
+    worker.submit(repo.sync_barcode, callback=lambda stats: print(stats), key="sync")
+    worker.schedule_periodic(repo.sync_barcode, 60.0)
+    worker.flush(timeout=5)
+    worker.stop()
+
+    get_lookup_worker().submit(repo._load_process_type, 12, callback=open_popup)
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from kivy import logger
+
+from utils.ui_dispatch import dispatch_to_ui
+
+
+class _Job:
+    __slots__ = ("func", "args", "kwargs", "callback", "error_callback", "key")
+
+    def __init__(self, func, args, kwargs, callback, error_callback, key):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = callback
+        self.error_callback = error_callback
+        self.key = key
+
+
+class SyncWorker:
+    def __init__(self, name: str = "sync-worker", dispatch: Callable = dispatch_to_ui, threads: int = 1):
+        self.name = name
+        self.threads = threads
+        self._dispatch = dispatch
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._pending_keys = set()
+        self._periodic = None
+        self._next_periodic = None
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self) -> None:
+        """Запускает поток, если он ещё не запущен"""
+        with self._lock:
+            if self.is_running:
+                return
+            self._stop_event.clear()
+            self._threads = [
+                threading.Thread(
+                    target=self._run,
+                    name=self.name if self.threads == 1 else f"{self.name}-{index}",
+                    daemon=True,
+                )
+                for index in range(self.threads)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Останавливает поток после текущего задания"""
+        with self._lock:
+            threads = self._threads
+            if not threads:
+                return
+            self._stop_event.set()
+            for _ in threads:
+                self._queue.put(None)
+            self._threads = []
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(
+            self,
+            func: Callable,
+            *args,
+            callback: Optional[Callable[[Any], None]] = None,
+            error_callback: Optional[Callable[[Exception], None]] = None,
+            key: Optional[str] = None,
+            **kwargs
+    ) -> bool:
+        """Ставит задание в очередь.
+
+        Args:
+            func: Функция, выполняемая в фоновом потоке
+            callback: Получает результат func в главном потоке
+            error_callback: Получает исключение func в главном потоке
+            key: Если задание с таким ключом уже ждёт в очереди, новое не добавляется
+
+        Returns:
+            True, если задание добавлено в очередь
+        """
+        with self._lock:
+            if key is not None:
+                if key in self._pending_keys:
+                    return False
+                self._pending_keys.add(key)
+        self._queue.put(_Job(func, args, kwargs, callback, error_callback, key))
+        return True
+
+    def schedule_periodic(self, func: Callable, interval: float, key: Optional[str] = "periodic") -> None:
+        """Выполняет func в фоновом потоке каждые interval секунд"""
+        with self._lock:
+            self._periodic = (func, interval, key)
+            self._next_periodic = time.monotonic() + interval
+        # Будим поток, чтобы он пересчитал время ожидания
+        self._queue.put(_Job(lambda: None, (), {}, None, None, None))
+
+    def cancel_periodic(self) -> None:
+        with self._lock:
+            self._periodic = None
+            self._next_periodic = None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт выполнения всех заданий, поставленных до вызова.
+
+        Returns:
+            True, если очередь обработана до истечения timeout
+        """
+        if not self.is_running:
+            return self._queue.empty()
+        done = threading.Event()
+        # Каждый поток берёт по одному заданию барьера и ждёт остальных, поэтому
+        # барьер проходится, когда все задания перед ним уже выполнены
+        barrier = threading.Barrier(self.threads, action=done.set)
+        for _ in range(self.threads):
+            self._queue.put(_Job(self._wait_barrier, (barrier, timeout), {}, None, None, None))
+        return done.wait(timeout)
+
+    @staticmethod
+    def _wait_barrier(barrier: threading.Barrier, timeout: Optional[float]) -> None:
+        try:
+            barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            pass
+
+    def _next_timeout(self) -> Optional[float]:
+        with self._lock:
+            if self._next_periodic is None:
+                return None
+            return max(0.0, self._next_periodic - time.monotonic())
+
+    def _take_periodic(self) -> Optional[_Job]:
+        with self._lock:
+            if self._periodic is None or time.monotonic() < self._next_periodic:
+                return None
+            func, interval, key = self._periodic
+            self._next_periodic = time.monotonic() + interval
+            if key in self._pending_keys:
+                return None
+        return _Job(func, (), {}, None, None, None)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                job = self._queue.get(timeout=self._next_timeout())
+            except queue.Empty:
+                job = self._take_periodic()
+                if job is not None:
+                    self._execute(job)
+                continue
+
+            if job is None:
+                break
+            self._execute(job)
+            periodic = self._take_periodic()
+            if periodic is not None:
+                self._execute(periodic)
+
+    def _execute(self, job: _Job) -> None:
+        if job.key is not None:
+            with self._lock:
+                self._pending_keys.discard(job.key)
+        try:
+            result = job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            logger.Logger.error(f"SyncWorker: job {getattr(job.func, '__name__', job.func)} failed: {e}")
+            if job.error_callback:
+                self._dispatch(job.error_callback, e)
+            return
+        if job.callback:
+            self._dispatch(job.callback, result)
+
+
+_worker = None
+_lookup_worker = None
+
+
+def get_sync_worker() -> SyncWorker:
+    """Возвращает общий для приложения фоновый поток синхронизации"""
+    global _worker
+    if _worker is None:
+        _worker = SyncWorker()
+    return _worker
+
+
+def get_lookup_worker() -> SyncWorker:
+    """Возвращает очередь запросов, которых ждёт интерфейс (отдельно от синхронизации)"""
+    global _lookup_worker
+    if _lookup_worker is None:
+        _lookup_worker = SyncWorker(name="lookup-worker", threads=2)
+    return _lookup_worker
@@ -1,28 +1,35 @@
-import sys
-
-from kivy.storage.jsonstore import JsonStore
+import importlib
 import os
-
-from kivymd.icon_definitions import md_icons
-from kivy.lang import Builder
-from kivymd.uix.toolbar import MDTopAppBar
-
-from data.db import engine
-from models.models import Base
-from data.session import AppSession
-from viewmodels.barcode_list_vm import BarcodeListScreen
-
-from viewmodels.login_vm import LoginScreen   # login.py
-from viewmodels.main_vm import MainScreen     # main_vm.py (MainScreen)
-
-from kivymd.uix.screenmanager import MDScreenManager
-from kivymd.app import MDApp
-
-from viewmodels.order_select_vm import OrderSelectScreen
-from viewmodels.settings_vm import SettingsScreen
-from kivy.utils import platform
-
-Base.metadata.create_all(engine)
+import sys
+import threading
+
+from utils.startup_profile import startup_profile
+
+with startup_profile.phase("import: kivy, kivymd"):
+    from kivy.clock import Clock
+    from kivy.lang import Builder
+    from kivy.storage.jsonstore import JsonStore
+    from kivy.utils import platform
+    from kivymd.app import MDApp
+    from kivy.properties import ObjectProperty
+    from kivymd.uix.screenmanager import MDScreenManager
+
+with startup_profile.phase("import: login screen"):
+    from data.services import AppServices
+    from data.session import AppSession
+    from viewmodels.login_vm import LoginScreen   # login.py
+
+# Экраны, которые строятся при первом переходе: имя -> (kv, модуль, класс).
+# main строится заранее, сразу после первого кадра экрана входа
+LAZY_SCREENS = {
+    "main": ("screens/main.kv", "viewmodels.main_vm", "MainScreen"),
+    "history": ("screens/barcode_list.kv", "viewmodels.barcode_list_vm", "BarcodeListScreen"),
+    "order_select": ("screens/order_select.kv", "viewmodels.order_select_vm", "OrderSelectScreen"),
+    "settings": ("screens/settings.kv", "viewmodels.settings_vm", "SettingsScreen"),
+}
+# Модули, которые фоновый поток импортирует заранее, пока виден экран входа.
+# Только слой данных: модули виджетов KivyMD при импорте вызывают Builder
+WARM_UP_MODULES = ("data.repository",)
 
 def resource_path(rel_path):
     if platform == 'android':
@@ -34,10 +41,48 @@ def resource_path(rel_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, rel_path)
 
+
+_loaded_kv = set()
+
+
+def load_kv(kv_file):
+    """Загружает kv-файл один раз"""
+    if kv_file in _loaded_kv:
+        return
+    _loaded_kv.add(kv_file)
+    kv_path = resource_path(kv_file)
+    if os.path.exists(kv_path) or platform == 'android':
+        try:
+            with startup_profile.phase(f"kv: {kv_file}"):
+                Builder.load_file(kv_path)
+        except Exception as e:
+            print(f"Error loading {kv_file}: {e}")
+
+
+class LazyScreenManager(MDScreenManager):
+    """Создаёт экраны из LAZY_SCREENS при первом обращении по имени"""
+    # Общие сервисы приложения, передаются каждому экрану
+    services = ObjectProperty(None)
+
+    def get_screen(self, name):
+        if name in LAZY_SCREENS and not self.has_screen(name):
+            self.build_screen(name)
+        return super().get_screen(name)
+
+    def build_screen(self, name):
+        kv_file, module_name, class_name = LAZY_SCREENS[name]
+        with startup_profile.phase(f"screen: {name}"):
+            module = importlib.import_module(module_name)
+            load_kv(kv_file)
+            self.add_widget(getattr(module, class_name)(name=name, services=self.services))
+
+
 class MyApp(MDApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.session = AppSession()
+        # Один Repository (HTTP-сессия и БД) на всё приложение, сбрасывается при выходе
+        self.services = AppServices()
         self.menu_popup = None
 
         # Простое определение директории настроек
@@ -55,36 +100,47 @@ class MyApp(MDApp):
 
     def build(self):
         self.apply_saved_theme()
-        kv_files = [
-            "screens/login.kv",
-            "screens/menu_popup.kv",
-            "screens/settings.kv",
-            "screens/main.kv",
-            "screens/barcode_list.kv",
-            "screens/order_select.kv"
-        ]
-
-        for kv_file in kv_files:
-            kv_path = resource_path(kv_file)
-            if os.path.exists(kv_path) or platform == 'android':
-                try:
-                    Builder.load_file(kv_path)
-                except Exception as e:
-                    print(f"Error loading {kv_file}: {e}")
-
-        sm = MDScreenManager()
-        sm.add_widget(LoginScreen(name="login"))
-        sm.add_widget(MainScreen(name="main"))
-        sm.add_widget(BarcodeListScreen(name="history"))
-        sm.add_widget(OrderSelectScreen(name="order_select"))
-        sm.add_widget(SettingsScreen(name="settings"))
+        # Остальные kv и экраны загружаются при первом переходе (LAZY_SCREENS)
+        load_kv("screens/login.kv")
+        sm = LazyScreenManager(services=self.services)
+        with startup_profile.phase("screen: login"):
+            sm.add_widget(LoginScreen(name="login", services=self.services))
         return sm
 
+    def on_start(self):
+        # Следующий тик — после отрисовки первого кадра
+        Clock.schedule_once(self._after_first_frame, 0)
+
+    def _after_first_frame(self, dt):
+        startup_profile.mark("first frame")
+        threading.Thread(target=self._warm_up, name="warm-up", daemon=True).start()
+
+    def _warm_up(self):
+        """Фоновая подготовка, пока пользователь видит экран входа"""
+        with startup_profile.phase("schema"):
+            from data.db import engine
+            from data.migrations import ensure_schema
+            try:
+                ensure_schema(engine)
+            except Exception as e:
+                print(f"Error preparing database: {e}")
+        with startup_profile.phase("import: data layer"):
+            for module_name in WARM_UP_MODULES:
+                importlib.import_module(module_name)
+        Clock.schedule_once(self._finish_startup, 0)
+
+    def _finish_startup(self, dt):
+        # Главный экран нужен сразу после входа — строим его заранее
+        self.root.get_screen("main")
+        startup_profile.log()
+        startup_profile.dump(os.path.join(self.user_data_dir, "startup_profile.json"))
+
     def show_menu_popup(self):
         from kivy.lang import Builder
         from kivymd.uix.dialog import MDDialog
 
         if not self.menu_popup:
+            load_kv("screens/menu_popup.kv")
             # Загружаем контент из kv
             content = Builder.load_string(
                 '''
@@ -111,11 +167,18 @@ MenuPopup:
         self.root.current = "settings"
 
     def logout(self):
+        self.services.reset()
         self.root.current = "login"
 
     def show_main(self):
         self.root.current = "main"
 
+    def on_stop(self):
+        from data.sync_worker import get_lookup_worker, get_sync_worker
+        get_sync_worker().stop()
+        get_lookup_worker().stop()
+        self.services.reset()
+
     def apply_saved_theme(self):
         try:
             if self.theme_store.exists("theme"):
@@ -17,6 +17,40 @@ class Barcode(BaseModel):
     class Config:
         from_attributes = True
 
+    def import_payload(self) -> dict:
+        """Поля для import-barcode(s) в JSON-совместимом виде"""
+        return self.model_dump(mode="json", include=IMPORT_FIELDS)
+
+
+class QueuedBarcode:
+    """Строка очереди отправки.
+
+    Лёгкая замена Barcode для синхронизации: создаётся прямо из кортежа
+    SQL-запроса без валидации pydantic.
+    """
+    __slots__ = ("id", "code", "created_at", "user_id", "order", "stage", "is_good")
+    # Колонки BarcodeORM в порядке аргументов конструктора
+    COLUMNS = __slots__
+
+    def __init__(self, id, code, created_at, user_id, order, stage, is_good):
+        self.id = id
+        self.code = code
+        self.created_at = created_at
+        self.user_id = user_id
+        self.order = order
+        self.stage = stage
+        self.is_good = is_good
+
+    def import_payload(self) -> dict:
+        return {
+            "code": self.code,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "user_id": self.user_id,
+            "order": self.order,
+            "stage": self.stage,
+            "is_good": self.is_good,
+        }
+
 
 class BarcodeImportSchema(BaseModel):
     code: str
@@ -24,4 +58,7 @@ class BarcodeImportSchema(BaseModel):
     user_id: int
     order: int
     stage: int
-    is_good: bool
\ No newline at end of file
+    is_good: bool
+
+
+IMPORT_FIELDS = set(BarcodeImportSchema.model_fields)
@@ -49,6 +49,8 @@ class ProcessTypeORM(Base):
     process_type_id = Column(
         Integer, ForeignKey("process_type.id"), nullable=False, default=0
     )
+    # Этапы в виде JSON-списка, чтобы выбирать этап без сервера
+    stages = Column(String, default="[]")
 
 
 class SessionORM(Base):
@@ -65,3 +67,10 @@ class LoginToken(Base):
         String, ForeignKey("user.id"),
         nullable=True, unique=True
     )
+
+
+class MetaORM(Base):
+    """Служебные значения приложения (ключ — значение)"""
+    __tablename__ = 'app_meta'
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=True)
@@ -1,6 +1,6 @@
-from typing import Optional, Union
+from typing import List, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from models.process_type import ProcessType
 
 class Order(BaseModel):
@@ -19,4 +19,8 @@ class Order(BaseModel):
             return self.process_type
         elif isinstance(self.process_type, ProcessType):
             return self.process_type.id
-        return self.process_type_id
\ No newline at end of file
+        return self.process_type_id
+
+
+# Валидация всего ответа API одним вызовом, без Order(**item) на каждый элемент
+ORDER_LIST = TypeAdapter(List[Order])
\ No newline at end of file
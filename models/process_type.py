@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import Optional, List
 from models.process_stage import ProcessStage
 
@@ -6,3 +6,6 @@ class ProcessType(BaseModel):
     id: int
     name: str = "Undefined"
     stages: List[ProcessStage] = []
+
+
+PROCESS_TYPE_LIST = TypeAdapter(List[ProcessType])
@@ -0,0 +1,188 @@
+"""
+Проверки HTTP/1.1 поверх asyncio в AsyncApiClient: чтение chunked-ответа
+и ответов без тела, повторное использование keep-alive соединения и повтор
+запроса на соединении, которое сервер закрыл, пока оно ждало в пуле.
+
+Запуск из корня проекта:
+    python -m pytest -q tests
+"""
+
+import socketserver
+import threading
+import unittest
+
+import requests
+
+from api.api_client import ApiClient
+from benchmarks.async_api_client import AsyncApiClient
+
+
+def _response(body: bytes, chunked: bool = False) -> bytes:
+    if not chunked:
+        return (
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+        )
+    half = len(body) // 2
+    chunks = b"".join(
+        f"{len(part):x}\r\n".encode() + part + b"\r\n" for part in (body[:half], body[half:]) if part
+    )
+    return (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        b"Transfer-Encoding: chunked\r\n\r\n" + chunks + b"0\r\n\r\n"
+    )
+
+
+class _ScriptedServer(socketserver.ThreadingTCPServer):
+    """Отвечает на запросы по очереди действиями из script.
+
+    Действие — байты ответа или None: закрыть соединение, не отвечая.
+    В requests записываются (номер соединения, метод, путь).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, script):
+        super().__init__(("127.0.0.1", 0), _ScriptedHandler)
+        self.script = list(script)
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _ScriptedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+            connection = self.server.connections
+        while True:
+            request_line = self.rfile.readline()
+            if not request_line:
+                return
+            length = 0
+            while True:
+                line = self.rfile.readline().decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            self.rfile.read(length)
+            method, path = request_line.decode("latin-1").split(" ")[:2]
+            with self.server.lock:
+                self.server.requests.append((connection, method, path))
+                action = self.server.script.pop(0)
+            if action is None:
+                return
+            self.wfile.write(action)
+            self.wfile.flush()
+
+
+class _BrokenWriter:
+    """Соединение из пула, которое оборвалось до записи запроса"""
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        raise ConnectionResetError("connection reset by peer")
+
+    def close(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+class AsyncApiClientHttpTest(unittest.TestCase):
+    def setUp(self):
+        ApiClient.breaker.reset()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        ApiClient.breaker.reset()
+
+    def start(self, *script):
+        self.server = _ScriptedServer(script)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = AsyncApiClient(self.server.url, dispatch=lambda func, *args: func(*args))
+
+    def request(self, method: str, path: str, json_data=None):
+        return self.client.submit(
+            self.client._request, method, "test", path, json_data=json_data
+        ).result(10)
+
+    def test_chunked_response(self):
+        body = b'{"results": [1, 2, 3], "next": null}'
+        self.start(_response(body, chunked=True), _response(b'{"ok": true}'))
+        response = self.request("GET", "/chunked/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"results": [1, 2, 3], "next": None})
+        # Ответ дочитан до конца: следующий запрос идёт по тому же соединению
+        self.assertEqual(self.request("GET", "/next/").json(), {"ok": True})
+        self.assertEqual([c for c, _, _ in self.server.requests], [1, 1])
+
+    def test_responses_without_body(self):
+        self.start(
+            b"HTTP/1.1 204 No Content\r\n\r\n",
+            b"HTTP/1.1 304 Not Modified\r\nETag: \"1\"\r\n\r\n",
+            b"HTTP/1.1 200 OK\r\nContent-Length: 12\r\n\r\n",
+            b"HTTP/1.1 100 Continue\r\n\r\n" + _response(b'{"ok": true}'),
+        )
+        # Без Content-Length чтение до EOF ждало бы таймаута на keep-alive соединении
+        self.assertEqual(self.request("DELETE", "/barcode/1/").status_code, 204)
+        self.assertEqual(self.request("GET", "/orders/").status_code, 304)
+        head = self.request("HEAD", "/orders/")
+        self.assertEqual((head.status_code, head.content), (200, b""))
+        self.assertEqual(self.request("POST", "/import-barcode/", json_data={}).json(), {"ok": True})
+        self.assertEqual(self.server.connections, 1)
+
+    def test_keep_alive_reuse(self):
+        self.start(*[_response(b'{"ok": true}')] * 3)
+        for _ in range(3):
+            self.assertEqual(self.request("GET", "/orders/").status_code, 200)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_stale_connection_retries_get(self):
+        self.start(_response(b"{}"), None, _response(b'{"ok": true}'))
+        self.request("GET", "/first/")
+        # Сервер закрывает соединение, получив запрос: GET повторяется по новому
+        self.assertEqual(self.request("GET", "/orders/").json(), {"ok": True})
+        self.assertEqual(
+            self.server.requests, [(1, "GET", "/first/"), (1, "GET", "/orders/"), (2, "GET", "/orders/")]
+        )
+
+    def test_stale_connection_does_not_resend_written_post(self):
+        self.start(_response(b"{}"), None, _response(b"{}"))
+        self.request("GET", "/first/")
+        # Запрос дошёл до сервера, и тот мог его выполнить: повтор создал бы дубль
+        with self.assertRaises(requests.ConnectionError):
+            self.request("POST", "/import-barcode/", json_data={"code": "1"})
+        self.assertEqual([m for _, m, _ in self.server.requests], ["GET", "POST"])
+
+    def test_stale_connection_retries_unwritten_post(self):
+        self.start(_response(b'{"ok": true}'))
+        connection = self.client._connection
+        calls = []
+
+        async def broken_then_fresh():
+            calls.append(1)
+            if len(calls) == 1:
+                return None, _BrokenWriter(), True
+            return await connection()
+
+        self.client._connection = broken_then_fresh
+        # Соединение оборвалось до записи: сервер запроса не видел, повтор безопасен
+        response = self.request("POST", "/import-barcode/", json_data={"code": "1"})
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual([m for _, m, _ in self.server.requests], ["POST"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Фоновые операции с отменой и прореженным прогрессом
+
+BackgroundTask выполняет функцию вне главного потока и возвращает в UI
+только несколько обновлений прогресса в секунду: пока предыдущее обновление
+не отрисовано, новые лишь заменяют последнее значение. Отмена кооперативная:
+функция проверяет task.cancelled между пачками или вызывает
+task.check_cancelled(), которая бросает TaskCancelled.
+
+Примеры использования:
+    def work(task):
+        for done in range(total):
+            task.check_cancelled()
+            ...
+            task.report(done + 1, total)
+        return {"sent": total}
+
+    task = BackgroundTask(work, on_progress=bar.update, on_complete=show_stats)
+    task.start()                          # свой поток
+    task.start(get_sync_worker().submit)  # или очередь SyncWorker
+    task.cancel()
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from kivy import logger
+
+from utils.ui_dispatch import dispatch_to_ui
+
+
+class TaskCancelled(Exception):
+    """Операция остановлена пользователем"""
+
+
+class BackgroundTask:
+    # Минимальный интервал между обновлениями прогресса в UI, секунды
+    PROGRESS_INTERVAL = 0.25
+
+    def __init__(
+            self,
+            func: Callable[["BackgroundTask"], Optional[Dict[str, Any]]],
+            on_progress: Optional[Callable[[int, Optional[int]], None]] = None,
+            on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+            on_error: Optional[Callable[[Exception], None]] = None,
+            dispatch: Callable = dispatch_to_ui
+    ):
+        self.func = func
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self._dispatch = dispatch
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._latest = None
+        self._pending = False
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def start(self, submit: Optional[Callable[[Callable], Any]] = None) -> bool:
+        """Запускает операцию в своём потоке или через submit (например, SyncWorker.submit).
+
+        Returns:
+            Результат submit (False, если очередь отклонила задание)
+        """
+        if submit is None:
+            threading.Thread(target=self._run, daemon=True).start()
+            return True
+        return submit(self._run) is not False
+
+    def report(self, done: int, total: Optional[int] = None) -> None:
+        """Сообщает прогресс; в UI уходит не чаще PROGRESS_INTERVAL"""
+        if self.on_progress is None:
+            return
+        with self._lock:
+            self._latest = (done, total)
+            if self._pending:
+                return
+            now = time.monotonic()
+            finished = total is not None and done >= total
+            if not finished and now - self._last_report < self.PROGRESS_INTERVAL:
+                return
+            self._pending = True
+            self._last_report = now
+        self._dispatch(self._deliver_progress)
+
+    def _deliver_progress(self) -> None:
+        with self._lock:
+            self._pending = False
+            done, total = self._latest
+        self.on_progress(done, total)
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        try:
+            stats = dict(self.func(self) or {})
+        except TaskCancelled:
+            stats = {}
+        except Exception as e:
+            logger.Logger.error(f"BackgroundTask: {e}")
+            if self.on_error:
+                self._dispatch(self.on_error, e)
+            return
+        stats["cancelled"] = self.cancelled
+        stats["elapsed"] = time.monotonic() - started
+        if self.on_progress is not None and self._latest is not None:
+            self._dispatch(self._deliver_final_progress)
+        if self.on_complete:
+            self._dispatch(self.on_complete, stats)
+
+    def _deliver_final_progress(self) -> None:
+        done, total = self._latest
+        self.on_progress(done, total)
@@ -0,0 +1,64 @@
+"""
+Индекс поиска заказов по подстроке названия
+
+Строится один раз при загрузке справочника: названия нормализуются заранее,
+заказы упорядочиваются по названию, а для запросов от трёх символов строится
+индекс триграмм. Кандидаты берутся из самого короткого списка триграмм запроса
+и проверяются на вхождение подстроки. Если запрос продолжает предыдущий
+(пользователь дописывает символы), поиск идёт только среди прошлых результатов.
+
+Примеры использования:
+    index = OrderSearchIndex(orders)
+    index.search("заказ 12")   # заказы, отсортированные по названию
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+NGRAM = 3
+
+
+def normalize(text: str) -> str:
+    return text.casefold().replace("ё", "е").strip()
+
+
+class OrderSearchIndex:
+    def __init__(self, orders: Sequence = ()):
+        self.build(orders)
+
+    def build(self, orders: Sequence) -> None:
+        self._orders = sorted(orders, key=lambda order: order.name)
+        self._names = [normalize(order.name) for order in self._orders]
+        grams: Dict[str, List[int]] = defaultdict(list)
+        for position, name in enumerate(self._names):
+            for gram in {name[i:i + NGRAM] for i in range(len(name) - NGRAM + 1)}:
+                grams[gram].append(position)
+        self._grams = dict(grams)
+        self._last_query = None
+        self._last_positions = None
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def search(self, text: str) -> List:
+        """Заказы, в названии которых есть text, в порядке названий"""
+        query = normalize(text)
+        if not query:
+            self._last_query, self._last_positions = None, None
+            return list(self._orders)
+
+        if self._last_query and query.startswith(self._last_query):
+            candidates = self._last_positions
+        elif len(query) >= NGRAM:
+            postings = [
+                self._grams.get(query[i:i + NGRAM], ())
+                for i in range(len(query) - NGRAM + 1)
+            ]
+            candidates = min(postings, key=len)
+        else:
+            candidates = range(len(self._names))
+
+        names = self._names
+        positions = [position for position in candidates if query in names[position]]
+        self._last_query, self._last_positions = query, positions
+        return [self._orders[position] for position in positions]
@@ -0,0 +1,92 @@
+"""
+Профиль холодного запуска
+
+Замеряет фазы запуска приложения (импорты, загрузка kv, построение
+экранов, первый кадр, подготовка схемы БД) от импорта модуля. Отчёт
+пишется в лог и в JSON-файл, чтобы сравнивать запуски между версиями.
+
+Примеры использования:
+    from utils.startup_profile import startup_profile
+
+    with startup_profile.phase("kv: login"):
+        Builder.load_file("screens/login.kv")
+    startup_profile.mark("first frame")
+    startup_profile.record("schema", 0.042)   # фаза, замеренная в другом потоке
+    startup_profile.log()
+    startup_profile.dump("startup_profile.json")
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._phases: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self, moment: Optional[float] = None) -> float:
+        return ((moment or time.perf_counter()) - self.started) * 1000
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, started)
+
+    def record(self, name: str, duration: float, started: Optional[float] = None) -> None:
+        """Добавляет фазу длительностью duration секунд"""
+        if started is None:
+            started = time.perf_counter() - duration
+        with self._lock:
+            self._phases.append({
+                "name": name,
+                "start_ms": round(self._elapsed_ms(started), 1),
+                "ms": round(duration * 1000, 1),
+                "thread": threading.current_thread().name,
+            })
+
+    def mark(self, name: str) -> None:
+        """Отметка момента без длительности (например, первый кадр)"""
+        self.record(name, 0.0, time.perf_counter())
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = sorted(self._phases, key=lambda phase: phase["start_ms"])
+        return {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_ms": round(self._elapsed_ms(), 1),
+            "phases": phases,
+        }
+
+    def log(self) -> None:
+        # Kivy импортируется после создания профиля, чтобы попасть в замер
+        from kivy import logger
+        report = self.report()
+        lines = [
+            f"{phase['start_ms']:8.1f} {phase['ms']:8.1f}  {phase['name']}"
+            for phase in report["phases"]
+        ]
+        logger.Logger.info(
+            f"Startup: {report['total_ms']:.1f} ms\n   start_ms       ms  phase\n" + "\n".join(lines)
+        )
+
+    def dump(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(self.report(), file, ensure_ascii=False, indent=2)
+        except OSError as e:
+            from kivy import logger
+            logger.Logger.warning(f"Startup: profile is not saved: {e}")
+
+
+# Создаётся при первом импорте, то есть в самом начале main.py
+startup_profile = StartupProfile()
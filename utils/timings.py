@@ -0,0 +1,135 @@
+"""
+Замеры времени этапов обработки скана
+
+Каждый этап (UI, Repository, БД, сеть) оборачивается в span; длительности
+по монотонным часам попадают в скользящее окно последних WINDOW замеров
+этапа, по которому считаются p50/p95/p99. Пока замеры выключены, span
+возвращает общий пустой объект и почти ничего не стоит.
+
+По умолчанию замеры выключены; включаются переменной окружения
+SCANER_TIMINGS=1 или переключателем на экране диагностики.
+
+Примеры использования:
+    from utils.timings import timings
+
+    with timings.span("db.insert"):
+        session.add(obj)
+    timings.record("scan.delivered", time.perf_counter() - started)
+    timings.stats()["db.insert"]["p95"]    # миллисекунды
+    timings.dump("scan_timings.json")
+    timings.enabled = True
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_timings", "_name", "_started")
+
+    def __init__(self, timings: "Timings", name: str):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timings.record(self._name, time.perf_counter() - self._started)
+        return False
+
+
+class Timings:
+    # Замеров на этап в скользящем окне
+    WINDOW = 500
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        """Контекстный менеджер, замеряющий время блока как этап name"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def now(self) -> Optional[float]:
+        """Метка начала для record_since; None, если замеры выключены"""
+        return time.perf_counter() if self.enabled else None
+
+    def record(self, name: str, duration: float) -> None:
+        """Добавляет замер длительностью duration секунд"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.WINDOW)
+                self._counts[name] = 0
+            samples.append(duration)
+            self._counts[name] += 1
+
+    def record_since(self, name: str, started: Optional[float]) -> None:
+        """Добавляет замер от метки now() до текущего момента"""
+        if started is not None and self.enabled:
+            self.record(name, time.perf_counter() - started)
+
+    @classmethod
+    def _percentile(cls, ordered, percent: int) -> float:
+        # Ближайший ранг: значение, не меньше которого percent% замеров
+        index = max(0, -(-len(ordered) * percent // 100) - 1)
+        return ordered[index]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Перцентили по окну каждого этапа, миллисекунды"""
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for name, ordered in sorted(snapshot.items()):
+            if not ordered:
+                continue
+            stage = {"count": counts[name], "window": len(ordered)}
+            for percent in self.PERCENTILES:
+                stage[f"p{percent}"] = round(self._percentile(ordered, percent) * 1000, 2)
+            stage["max"] = round(ordered[-1] * 1000, 2)
+            result[name] = stage
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def dump(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": self.stats()},
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+# Общие замеры приложения
+timings = Timings(enabled=os.environ.get("SCANER_TIMINGS", "") not in ("", "0"))
@@ -0,0 +1,57 @@
+"""
+Ограниченный LRU-кэш с временем жизни записей
+
+Потокобезопасен: читается из UI, заполняется из фонового потока.
+
+Примеры использования:
+    cache = TTLCache(maxsize=32, ttl=600)
+    cache.put(5, process_type)
+    cache.get(5)   # None, если записи нет или она старше ttl
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 32, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[0] if item else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,21 @@
+"""
+Передача результатов фоновых потоков в главный поток Kivy
+
+Фоновые сервисы (SyncWorker, монитор связи, BackgroundTask) принимают
+функцию dispatch; по умолчанию это dispatch_to_ui, а в бенчмарках
+и тестах вместо неё передают прямой вызов.
+
+Примеры использования:
+    from utils.ui_dispatch import dispatch_to_ui
+
+    dispatch_to_ui(callback, result)   # callback(result) в следующем кадре
+"""
+
+from typing import Callable
+
+from kivy.clock import Clock
+
+
+def dispatch_to_ui(func: Callable, *args) -> None:
+    """Вызывает func(*args) в главном потоке Kivy"""
+    Clock.schedule_once(lambda dt: func(*args))
@@ -1,19 +1,19 @@
-import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List
 
-from kivy.clock import Clock
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
 from kivy.uix.progressbar import ProgressBar
 from kivy.uix.screenmanager import Screen
-from kivy.properties import StringProperty, BooleanProperty, NumericProperty
+from kivy.properties import StringProperty, BooleanProperty, NumericProperty, ObjectProperty
 from kivymd.uix.boxlayout import MDBoxLayout
-import json
 
-from models.models import BarcodeORM, OrderORM
-from data.repository import Repository
+from models.models import BarcodeORM
+from data.exporter import BarcodeExporter
+from data.repository import Repository, SYNC_JOB_KEY
+from data.sync_worker import get_sync_worker
+from utils.background_task import BackgroundTask
 from models.barcode import Barcode
 
 
@@ -26,27 +26,48 @@ class BarcodeItem(MDBoxLayout):
 
 
 class BarcodeListScreen(Screen):
+    # Размер страницы истории и предел строк, одновременно хранимых в RecycleView
+    PAGE_SIZE = 100
+    WINDOW_SIZE = 1000
+    # Доля прокрутки от края, при которой догружается следующая страница
+    LOAD_THRESHOLD = 0.1
+    HISTORY_COLUMNS = ["id", "code", "is_sent", "created_at", "error_count"]
+    services = ObjectProperty(None)
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._progress_popup = None
-        self._current_operation = None
-        self._is_data_updated = False  # Флаг для отслеживания обновлений данных
+        self._has_older = False
+        self._has_newer = False
+        self._page_loading = False
 
-    def _show_progress_popup(self, title: str, max_value: int):
-        """Создаёт popup с прогресс-баром."""
+    def _show_progress_popup(self, title: str, max_value: int, task=None):
+        """Создаёт popup с прогресс-баром и кнопкой отмены задачи."""
         layout = BoxLayout(orientation='vertical', spacing=10)
         self._progress_bar = ProgressBar(max=max_value)
         layout.add_widget(Label(text=title))
         layout.add_widget(self._progress_bar)
+        if task is not None:
+            from kivymd.uix.button import MDFlatButton
+            cancel_btn = MDFlatButton(text="ОТМЕНА", pos_hint={"center_x": .5})
+
+            def cancel(btn):
+                task.cancel()
+                btn.disabled = True
+                btn.text = "ОТМЕНЯЕТСЯ..."
+
+            cancel_btn.bind(on_release=cancel)
+            layout.add_widget(cancel_btn)
 
         self._progress_popup = Popup(
             title="Отправка данных",
             content=layout,
-            size_hint=(0.8, 0.3)
+            size_hint=(0.8, 0.35),
+            auto_dismiss=False
         )
         self._progress_popup.open()
 
-    def _update_progress(self, value: int):
+    def _update_progress(self, value: int, total=None):
         """Обновляет прогресс-бар."""
         if self._progress_popup:
             self._progress_bar.value = value
@@ -63,183 +84,270 @@ class BarcodeListScreen(Screen):
 
     def update_unsynced_count(self):
         """Обновляет информацию о неотправленных штрих-кодах"""
-        repo = Repository()
-        unsynced = repo.db.get_unsynced_barcodes()
-
-        # Группируем по заказам
-        orders = {}
-        for barcode in unsynced:
-            order_id = barcode["order"]
-            if order_id not in orders:
-                orders[order_id] = {
-                    "count": 0,
-                    "name": self._get_order_name(order_id)
-                }
-            orders[order_id]["count"] += 1
+        repo = self.services.repository
+        counts = repo.get_unsynced_summary()
+        self._render_unsynced(counts)
+        # Неизвестные названия догружаются в фоне, затем текст перерисовывается
+        repo.resolve_order_names(
+            list(counts),
+            callback=lambda names: self._render_unsynced(counts)
+        )
 
+    def _render_unsynced(self, counts):
         # Формируем текст для отображения
-        if not orders:
+        if not counts:
             self.ids.unsynced_info.text = "Все штрих-коды синхронизированы"
-        else:
-            text = ""
-            for order_id, data in orders.items():
-                text += f"Заказ: {data['name']} Не отправлено: {data['count']}\n"
-            self.ids.unsynced_info.text = text.strip()
-
-    def _get_order_name(self, order_id):
-        repo = Repository()
-        order = repo.db.get_one(OrderORM, {"id": order_id})
-        if order:
-            name = order.get("name") if isinstance(order, dict) else getattr(order, "name", None)
-            if name:
-                return name
-
-        # Если не нашли в локальной БД — пробуем запросить с сервера
-        try:
-            api_order = repo.api.get_order_by_id(order_id)
-            if api_order and "name" in api_order:
-                return api_order["name"]
-        except Exception as e:
-            print(f"Ошибка получения заказа с сервера: {e}")
+            return
+        names = Repository.order_names
+        self.ids.unsynced_info.text = "\n".join(
+            f"Заказ: {names.display_name(order_id)} Не отправлено: {count}"
+            for order_id, count in counts.items()
+        )
 
-        return f"ID:{order_id}"
+    def _history_filters(self):
+        from data.session import AppSession
+        current_order = getattr(AppSession, "order", None)
+        return {"order": current_order.id} if current_order else None
+
+    def _fetch_page(self, cursor=None, newer=False):
+        """Загружает страницу истории и готовит строки для RecycleView"""
+        rows = self.services.db.get_keyset_page(
+            BarcodeORM,
+            filters=self._history_filters(),
+            cursor=cursor,
+            limit=self.PAGE_SIZE,
+            newer=newer,
+            columns=self.HISTORY_COLUMNS,
+            raw=True,
+        )
+        # Один словарь на строку сразу в виде для RecycleView; курсор хранит
+        # исходное значение created_at, в view уходит строка
+        return [
+            {
+                "id": row_id,
+                "code": code,
+                "is_sent": is_sent,
+                "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S") if created_at else "",
+                "error_count": error_count,
+                "cursor": (created_at, row_id),
+            }
+            for row_id, code, is_sent, created_at, error_count in rows
+        ]
 
     def load_barcode(self):
+        """Показывает первую (самую новую) страницу истории"""
         from data.session import AppSession
-        repo = Repository()
         current_order = getattr(AppSession, "order", None)
 
+        rows = self._fetch_page()
+        self._has_older = len(rows) == self.PAGE_SIZE
+        self._has_newer = False
+        self.ids.barcode_rv.data = rows
+        self.ids.barcode_rv.scroll_y = 1
         if current_order:
-            # Фильтруем по выбранному заказу
-            filters = {"order": current_order.id}
-            barcodes = repo.db.get_all(BarcodeORM, filters=filters)
-            self.ids.barcode_rv.data = [
-                {
-                    "id": b["id"],
-                    "code": b["code"],
-                    "is_sent": b["is_sent"],
-                    "created_at": b["created_at"].strftime("%Y-%m-%d %H:%M:%S") if b["created_at"] else "",
-                    "error_count": b["error_count"],
-                }
-                for b in barcodes
-            ]
             self.ids.order_filter_label.text = f"Фильтр: {current_order.name}"
         else:
-            # Показываем все записи
-            barcodes = repo.db.get_all(BarcodeORM)
-            self.ids.barcode_rv.data = [
-                {
-                    "id": b["id"],
-                    "code": b["code"],
-                    "is_sent": b["is_sent"],
-                    "created_at": b["created_at"].strftime("%Y-%m-%d %H:%M:%S") if b["created_at"] else "",
-                    "error_count": b["error_count"],
-                }
-                for b in barcodes
-            ]
             self.ids.order_filter_label.text = "Фильтр: все заказы"
 
+    def on_history_scroll(self, rv):
+        """Догружает страницы, когда список прокручен к краю"""
+        if self._page_loading or not rv.data:
+            return
+        if rv.scroll_y <= self.LOAD_THRESHOLD and self._has_older:
+            self._load_page(newer=False)
+        elif rv.scroll_y >= 1 - self.LOAD_THRESHOLD and self._has_newer:
+            self._load_page(newer=True)
+
+    def _load_page(self, newer):
+        rv = self.ids.barcode_rv
+        self._page_loading = True
+        try:
+            data = rv.data
+            cursor = data[0]["cursor"] if newer else data[-1]["cursor"]
+            rows = self._fetch_page(cursor=cursor, newer=newer)
+            if not rows:
+                if newer:
+                    self._has_newer = False
+                else:
+                    self._has_older = False
+                return
+            if newer:
+                self._has_newer = len(rows) == self.PAGE_SIZE
+                window = rows + list(data)
+                # Окно ограничено: лишнее отбрасываем с противоположного края
+                overflow = max(0, len(window) - self.WINDOW_SIZE)
+                if overflow:
+                    window = window[:-overflow]
+                    self._has_older = True
+                offset = len(rows)
+            else:
+                self._has_older = len(rows) == self.PAGE_SIZE
+                window = list(data) + rows
+                overflow = max(0, len(window) - self.WINDOW_SIZE)
+                if overflow:
+                    window = window[overflow:]
+                    self._has_newer = True
+                offset = -overflow
+            top_before = self._distance_from_top(rv, len(data))
+            rv.data = window
+            # Сохраняем видимые строки на месте после вставки/обрезки сверху
+            self._restore_distance_from_top(rv, len(window), top_before + offset * self._row_pitch(rv))
+        finally:
+            self._page_loading = False
+
+    @staticmethod
+    def _row_pitch(rv):
+        layout = rv.layout_manager
+        return layout.default_size[1] + layout.spacing
+
+    def _distance_from_top(self, rv, rows):
+        scrollable = rows * self._row_pitch(rv) - rv.height
+        return (1 - rv.scroll_y) * scrollable if scrollable > 0 else 0
+
+    def _restore_distance_from_top(self, rv, rows, distance):
+        scrollable = rows * self._row_pitch(rv) - rv.height
+        if scrollable > 0:
+            rv.scroll_y = min(1, max(0, 1 - distance / scrollable))
+
     def sync_all(self):
-        from threading import Thread
-        repo = Repository()
-        unsynced = repo.db.get_unsynced_barcodes()
-        total = len(unsynced)
+        repo = self.services.repository
+        total = repo.db.count(BarcodeORM, {"is_sent": False})
         if total == 0:
             self._show_message("Нет данных для отправки")
             return
 
-        self._show_progress_popup("Синхронизация...", total)
-        ok_count = 0
-        fail_count = 0
-
-        def sync_thread():
-            nonlocal ok_count, fail_count
-            for idx, barcode_orm in enumerate(unsynced):
-                barcode_data = {
-                    "code": barcode_orm["code"],
-                    "order": barcode_orm["order"],
-                    "user_id": barcode_orm["user_id"],
-                    "stage": barcode_orm["stage"],
-                    "is_good": barcode_orm["is_good"],
-                    "created_at": barcode_orm["created_at"],
-                    "is_sent": False,
-                    "error_count": barcode_orm["error_count"],
-                }
-                try:
-                    success = repo.send_barcode(barcode_data)
-                    if success:
-                        repo.db.update(BarcodeORM, barcode_orm["id"], {"is_sent": True, "error_count": 0})
-                        ok_count += 1
-                    else:
-                        repo.db.update(BarcodeORM, barcode_orm["id"], {"error_count": barcode_orm["error_count"] + 1})
-                        fail_count += 1
-                except Exception:
-                    repo.db.update(BarcodeORM, barcode_orm["id"], {"error_count": barcode_orm["error_count"] + 1})
-                    fail_count += 1
-                # Прогрессбар
-                Clock.schedule_once(lambda dt, val=idx + 1: self._update_progress(val))
-
-            def after_sync(dt):
-                self._close_progress_popup()
-                self.load_barcode()
-                msg = f"Синхронизировано: {ok_count}\nОшибок: {fail_count}"
-                self._show_message(msg)
-
-            Clock.schedule_once(after_sync)
-
-        Thread(target=sync_thread, daemon=True).start()
-
-    def export_json(self):
-        repo = Repository()
-        barcodes = repo.db.get_unsynced_barcodes()
-        total = len(barcodes)
+        def after_sync(stats):
+            self._close_progress_popup()
+            self.load_barcode()
+            msg = f"Синхронизировано: {stats['sent']}\nОшибок: {stats['failed']}"
+            if stats["cancelled"]:
+                msg = "Синхронизация отменена\n" + msg
+            self._show_message(msg)
+
+        def after_error(error):
+            self._close_progress_popup()
+            self._show_message(f"Ошибка синхронизации: {error}")
+
+        task = BackgroundTask(
+            lambda task: repo.sync_barcode(progress=task.report, should_stop=lambda: task.cancelled),
+            on_progress=self._update_progress,
+            on_complete=after_sync,
+            on_error=after_error,
+        )
+        self._show_progress_popup("Синхронизация...", total, task)
+        # Синхронизация идёт в очереди SyncWorker вместе с автосинхронизацией
+        if not task.start(lambda run: get_sync_worker().submit(run, key=SYNC_JOB_KEY)):
+            self._close_progress_popup()
+            self._show_message("Синхронизация уже выполняется")
+
+    def export_history(self):
+        """Открывает выбор формата и отбора строк для экспорта."""
+        from kivy.uix.checkbox import CheckBox
+        from kivy.uix.textinput import TextInput
+        from kivymd.uix.button import MDRaisedButton
+        from data.session import AppSession
+
+        layout = BoxLayout(orientation="vertical", spacing=8)
+        options = {}
+        checkboxes = [("unsent_only", "Только неотправленные"), ("compress", "Сжать (gzip)")]
+        if AppSession.stage is not None:
+            checkboxes.insert(1, ("stage_only", f"Только этап «{AppSession.stage.name}»"))
+        for key, text in checkboxes:
+            row = BoxLayout(orientation="horizontal", size_hint_y=None, height=40)
+            options[key] = CheckBox(size_hint_x=None, width=40)
+            row.add_widget(options[key])
+            row.add_widget(Label(text=text, halign="left"))
+            layout.add_widget(row)
+        dates = BoxLayout(orientation="horizontal", spacing=8, size_hint_y=None, height=40)
+        for key, text in (("date_from", "С"), ("date_to", "По")):
+            options[key] = TextInput(hint_text="ДД.ММ.ГГГГ", multiline=False, write_tab=False)
+            dates.add_widget(Label(text=text, size_hint_x=None, width=32))
+            dates.add_widget(options[key])
+        layout.add_widget(dates)
+        buttons = BoxLayout(orientation="horizontal", spacing=8, size_hint_y=None, height=48)
+        for fmt in BarcodeExporter.FORMATS:
+            buttons.add_widget(MDRaisedButton(
+                text=fmt.upper(),
+                on_release=lambda x, f=fmt: self._start_export(
+                    f,
+                    compress=options["compress"].active,
+                    unsent_only=options["unsent_only"].active,
+                    stage_only="stage_only" in options and options["stage_only"].active,
+                    date_from=options["date_from"].text,
+                    date_to=options["date_to"].text,
+                )
+            ))
+        layout.add_widget(buttons)
+        self._export_popup = Popup(title="Экспорт истории", content=layout, size_hint=(.8, .6))
+        self._export_popup.open()
+
+    @staticmethod
+    def _parse_export_date(text: str):
+        """ДД.ММ.ГГГГ -> datetime начала дня; пустая строка -> None
+
+        Raises:
+            ValueError: Если дата введена в другом формате
+        """
+        text = text.strip()
+        return datetime.strptime(text, "%d.%m.%Y") if text else None
+
+    def _start_export(self, fmt, compress=False, unsent_only=False, stage_only=False, date_from="", date_to=""):
+        from data.session import AppSession
+
+        try:
+            date_from = self._parse_export_date(date_from)
+            date_to = self._parse_export_date(date_to)
+        except ValueError:
+            self._show_message("Дата должна быть в формате ДД.ММ.ГГГГ")
+            return
+        self._export_popup.dismiss()
+        exporter = BarcodeExporter(self.services.db)
+        query = {}
+        filters = self._history_filters()
+        if filters:
+            query["order"] = filters["order"]
+        if stage_only and AppSession.stage is not None:
+            query["stage"] = AppSession.stage.id
+        if date_from is not None:
+            query["date_from"] = date_from
+        if date_to is not None:
+            # Дата «по» включительно: экспортер берёт created_at < date_to
+            query["date_to"] = date_to + timedelta(days=1)
+        if unsent_only:
+            query["is_sent"] = False
+        total = exporter.count(**query)
         if total == 0:
             self._show_message("Нет данных для экспорта")
             return
 
+        path = exporter.make_path(fmt, compress)
+
+        def after_export(stats):
+            self._close_progress_popup()
+            if stats["cancelled"]:
+                self._show_message("Экспорт отменён")
+            else:
+                self._show_message(f"Экспорт завершён ({stats['written']} записей):\n{path}")
+
+        def after_error(error):
+            self._close_progress_popup()
+            self._show_message(f"Ошибка экспорта: {error}")
+
+        task = BackgroundTask(
+            lambda task: {"written": exporter.export(
+                path, fmt, compress,
+                progress=task.report,
+                should_stop=lambda: task.cancelled,
+                total=total,
+                **query
+            )},
+            on_progress=self._update_progress,
+            on_complete=after_export,
+            on_error=after_error,
+        )
         # Показываем прогресс-бар
-        self._show_progress_popup("Экспорт в JSON...", total)
-        data = []
-        filename = None
-
-        def export_thread():
-            nonlocal filename
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = f"barcodes_export_{timestamp}.json"
-            os.makedirs("exports", exist_ok=True)
-            filename = os.path.join("exports", filename)
-            counter = 1
-            while os.path.exists(filename):
-                filename = f"barcodes_export_{timestamp}_{counter}.json"
-                counter += 1
-
-            for idx, barcode in enumerate(barcodes):
-                item = {
-                    "Id": barcode["id"],
-                    "Code": barcode["code"],
-                    "CreatedAt": barcode["created_at"].isoformat() if barcode["created_at"] else None,
-                    "User": barcode["user_id"],
-                    "Order": barcode["order"],
-                    "Stage": barcode["stage"],
-                    "IsGood": barcode["is_good"],
-                    "IsSent": barcode["is_sent"],
-                    "ErrorCount": barcode["error_count"]
-                }
-                data.append(item)
-                # обновляем прогресс
-                Clock.schedule_once(lambda dt, val=idx + 1: self._update_progress(val))
-            # Сохраняем файл
-            with open(filename, "w", encoding="utf-8") as jsonfile:
-                json.dump(data, jsonfile, indent=2, ensure_ascii=False, default=str)
-
-            def after_export(dt):
-                self._close_progress_popup()
-                self._show_message(f"Экспорт завершён:\n{filename}")
-
-            Clock.schedule_once(after_export)
-
-        from threading import Thread
-        Thread(target=export_thread, daemon=True).start()
+        self._show_progress_popup(f"Экспорт в {fmt.upper()}...", total, task)
+        task.start()
 
     def _show_message(self, text: str):
         """Показывает всплывающее сообщение."""
@@ -267,45 +375,22 @@ class BarcodeListScreen(Screen):
 
     def _try_send_one(self, barcode_item):
         self._select_popup.dismiss()
-        from threading import Thread
-        repo = Repository()
+        repo = self.services.repository
 
-        def send_thread():
-            obj = repo.db.get_one(BarcodeORM, {"id": barcode_item.id})  # теперь obj — dict!
-            if not obj:
-                Clock.schedule_once(lambda dt: self._show_message("Не найден в БД"))
-                return
-            data = {
-                "code": obj["code"],
-                "order": obj["order"],
-                "user_id": obj["user_id"],
-                "stage": obj["stage"],
-                "is_good": obj["is_good"],
-                "created_at": obj["created_at"],
-                "is_sent": False,
-                "error_count": obj["error_count"],
-            }
-            try:
-                success = repo.send_barcode(data)
-                if success:
-                    repo.db.update(BarcodeORM, obj["id"], {"is_sent": True, "error_count": 0})
-                    msg = "Успешно отправлено"
-                else:
-                    repo.db.update(BarcodeORM, obj["id"], {"error_count": obj["error_count"] + 1})
-                    msg = "Ошибка при отправке"
-            except Exception as e:
-                repo.db.update(BarcodeORM, obj["id"], {"error_count": obj["error_count"] + 1})
-                msg = f"Ошибка: {str(e)}"
-            Clock.schedule_once(lambda dt: (self.load_barcode(), self._show_message(msg)))
+        def after_send(result):
+            self.load_barcode()
+            self._show_message(result["message"])
 
-        Thread(target=send_thread, daemon=True).start()
+        BackgroundTask(
+            lambda task: repo.resend_barcode(barcode_item.id),
+            on_complete=after_send,
+            on_error=lambda e: self._show_message(f"Ошибка: {str(e)}"),
+        ).start(get_sync_worker().submit)
 
     def _delete_one(self, barcode_item):
         self._select_popup.dismiss()
-        repo = Repository()
-        obj = repo.db.get_one(BarcodeORM, {"id": barcode_item.id})  # теперь obj — dict!
-        if obj:
-            repo.db.delete(BarcodeORM, obj["id"])
+        repo = self.services.repository
+        if repo.delete_barcode(barcode_item.id):
             self.load_barcode()
             self._show_message("Удалено")
         else:
@@ -336,7 +421,7 @@ class BarcodeListScreen(Screen):
     def _perform_clear_history(self):
         """Выполняет очистку истории после подтверждения"""
         self._confirm_dialog.dismiss()
-        repo = Repository()
+        repo = self.services.repository
 
         # Удаляем только отправленные записи
         deleted_count = repo.db.delete_many(BarcodeORM, {"is_sent": True})
@@ -1,11 +1,11 @@
 from kivy.clock import Clock
 from kivy.uix.screenmanager import Screen
 from kivy.properties import ObjectProperty
-from data.repository import Repository
 from data.session import AppSession
 
 
 class LoginScreen(Screen):
+    services = ObjectProperty(None)
     username = ObjectProperty(None)
     password = ObjectProperty(None)
     token = ObjectProperty(None)
@@ -50,11 +50,14 @@ class LoginScreen(Screen):
         username = self.ids.username.text.strip()
         password = self.ids.password.text
 
-        repo = Repository()
+        # Слой данных импортируется при первом входе, а не при запуске
+        repo = self.services.repository
         try:
             user = repo.api.login(username, password)
             AppSession.user = user
             AppSession.permissions = getattr(user, "permissions", [])
+            # Отправка накопленных штрих-кодов идёт в фоновом потоке
+            repo.start_auto_sync()
 
             main_screen = self.manager.get_screen("main")
             if hasattr(main_screen, "on_pre_enter"):
@@ -71,9 +74,11 @@ class LoginScreen(Screen):
             self.ids.error_label.text = "Введите токен!"
             return
         try:
-            user = Repository().api.login_by_token(token)
+            repo = self.services.repository
+            user = repo.api.login_by_token(token)
             AppSession.user = user
             AppSession.permissions = getattr(user, "permissions", [])
+            repo.start_auto_sync()
             main_screen = self.manager.get_screen("main")
             if hasattr(main_screen, "on_pre_enter"):
                 main_screen.on_pre_enter()
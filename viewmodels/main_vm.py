@@ -2,16 +2,16 @@ from kivy.animation import Animation
 from kivy.app import App
 from kivy.metrics import dp
 from kivy.uix.screenmanager import Screen
-from kivy.properties import StringProperty, ListProperty, BooleanProperty
+from kivy.properties import StringProperty, ListProperty, BooleanProperty, ObjectProperty
 from kivy.clock import Clock
 
-from data.repository import Repository
+from data.connectivity import DEGRADED, OFFLINE, get_connectivity_monitor
 from data.session import AppSession
-from models.barcode import Barcode
 from datetime import datetime
+from functools import partial
 
-from models.models import BarcodeORM
 from utils.stage_button import StageButton
+from utils.timings import timings
 
 
 class MainScreen(Screen):
@@ -20,8 +20,14 @@ class MainScreen(Screen):
     stage_display = StringProperty("не выбран")
     status_color = ListProperty([0, 0.5, 0, 1])
     is_good_state = BooleanProperty(True)
+    connection_display = StringProperty("")
+    # Общие сервисы приложения (data/services.py), передаёт MyApp
+    services = ObjectProperty(None)
 
     def on_pre_enter(self, *args):
+        monitor = get_connectivity_monitor()
+        monitor.add_listener(self._on_connectivity_changed)
+        self._on_connectivity_changed(monitor.state, None)
         user = getattr(AppSession, "user", None)
         self.user_display = user.username if user else "не выбран"
         order = getattr(AppSession, "order", None)
@@ -40,8 +46,20 @@ class MainScreen(Screen):
         Clock.schedule_once(lambda dt: self.focus_barcode(), 0)  # Фокус после инициализации
 
 
+    def on_leave(self, *args):
+        get_connectivity_monitor().remove_listener(self._on_connectivity_changed)
+
+    def _on_connectivity_changed(self, state, previous):
+        if state == OFFLINE:
+            self.connection_display = "Нет связи с сервером — сканы сохраняются локально"
+        elif state == DEGRADED:
+            self.connection_display = "Связь с сервером нестабильна"
+        else:
+            self.connection_display = ""
+
     def change_user(self):
-        self.manager.current = "login"
+        # Новый пользователь входит с новой HTTP-сессией, без cookies прежнего
+        App.get_running_app().logout()
 
     def select_order(self):
         self.manager.current = "order_select"
@@ -53,8 +71,20 @@ class MainScreen(Screen):
             self.show_status("Сначала выберите заказ!", error=True)
             return
 
-        repo = Repository()
-        process_type = repo.api.get_process_type(order.get_process_type_id())
+        repo = self.services.repository
+        process_type = repo.get_cached_process_type(order.get_process_type_id())
+        if process_type is None:
+            # Этапов нет ни в кэше, ни в справочнике — загружаем в фоне
+            self.show_status("Загрузка этапов...")
+            repo.prefetch_stages(
+                order.get_process_type_id(),
+                callback=self._open_stage_popup,
+                error_callback=lambda e: self.show_status(f"Ошибка загрузки этапов: {e}", error=True),
+            )
+            return
+        self._open_stage_popup(process_type)
+
+    def _open_stage_popup(self, process_type):
         stages = getattr(process_type, "stages", [])
         if not stages:
             self.show_status("Для заказа нет этапов", error=True)
@@ -89,6 +119,8 @@ class MainScreen(Screen):
 
     def _set_stage(self, stage):
         AppSession.stage = stage
+        # Проверка дублей дальше идёт по индексу в памяти
+        self.services.repository.load_duplicate_index(AppSession.order.id, stage.id)
         self.stage_display = stage.name
         self.is_good_state = True
 
@@ -125,6 +157,7 @@ class MainScreen(Screen):
             self.ids.barcode_input.focus = True
 
     def process_barcode(self, code):
+        started = timings.now()
         code = code.strip()
         if not code:
             return
@@ -141,33 +174,56 @@ class MainScreen(Screen):
             self.show_status("Нет пользователя", error=True)
             return
 
-        repo = Repository()
-
-        barcode_data = dict(
-            code=code,
-            order=order.id,
-            user_id=user.id,
-            stage=stage.id,
-            is_good=self.is_good_state,
-            created_at=datetime.now(),
-            is_sent=False,
-            error_count=0
-        )
+        with timings.span("ui.process_barcode"):
+            repo = self.services.repository
+
+            barcode_data = dict(
+                code=code,
+                order=order.id,
+                user_id=user.id,
+                stage=stage.id,
+                is_good=self.is_good_state,
+                created_at=datetime.now(),
+                is_sent=False,
+                error_count=0
+            )
 
-        result = repo.save_and_send_barcode(barcode_data)
-        if not result["success"]:
-            if result.get("reason") == "duplicate":
-                self.show_status("Такой штрихкод уже есть для этого этапа!", error=True)
-            elif result.get("reason") == "db_error":
-                self.show_status(f"Ошибка БД: {result.get('error')}", error=True)
+            result = repo.save_and_send_barcode(
+                barcode_data,
+                on_delivered=partial(self._on_barcode_delivered, started)
+            )
+            if not result["success"]:
+                self._last_barcode_id = None
+                if result.get("reason") == "duplicate":
+                    self.show_status("Такой штрихкод уже есть для этого этапа!", error=True)
+                elif result.get("reason") == "db_error":
+                    self.show_status(f"Ошибка БД: {result.get('error')}", error=True)
+                else:
+                    self.show_status("Ошибка отправки", error=True)
+                self.ids.barcode_input.text = ""
+                self.ids.barcode_input.focus = True
+                return
+            self._last_barcode_id = result["barcode_id"]
+            if result.get("offline"):
+                self.show_status("Сохранено, будет отправлено позже")
+            elif result.get("queued"):
+                self.show_status("Сохранено", success=True)
             else:
-                self.show_status("Ошибка отправки", error=True)
+                self.show_status("Отправлено", success=True)
             self.ids.barcode_input.text = ""
             self.ids.barcode_input.focus = True
+
+    def _on_barcode_delivered(self, started, result):
+        """Второй сигнал скана: фоновая отправка завершилась"""
+        # От нажатия Enter до ответа сервера, включая очередь и возврат в UI
+        timings.record_since("scan.delivered", started)
+        # Статус уже показывает более новый скан
+        if result["barcode_id"] != getattr(self, "_last_barcode_id", None):
             return
-        self.show_status("Отправлено", success=True)
-        self.ids.barcode_input.text = ""
-        self.ids.barcode_input.focus = True
+        if result["delivered"]:
+            self.show_status("Отправлено", success=True)
+        else:
+            self.show_status("Сохранено, будет отправлено позже")
 
     def show_status(self, msg, success=False, error=False):
         self.ids.save_status.text = msg
@@ -1,13 +1,14 @@
 
-from kivy.properties import NumericProperty, StringProperty, BooleanProperty
+from kivy.clock import Clock
+from kivy.properties import NumericProperty, StringProperty, BooleanProperty, ObjectProperty
 from kivy.uix.screenmanager import Screen
 from kivymd.uix.behaviors import HoverBehavior
 
-from data.repository import Repository
 from data.session import AppSession
 from kivymd.uix.list import OneLineAvatarIconListItem
 
 from models.process_type import ProcessType
+from utils.order_search import OrderSearchIndex
 
 
 # Класс для RecycleView, чтобы работал индикатор выбора
@@ -19,39 +20,72 @@ class OrderListItem(HoverBehavior, OneLineAvatarIconListItem):
 
 
 class OrderSelectScreen(Screen):
+    services = ObjectProperty(None)
     all_orders = []
     selected_order_id = None
+    # Пауза после последнего символа перед поиском, секунды
+    SEARCH_DEBOUNCE = 0.15
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._search_index = OrderSearchIndex()
+        self._search_event = None
 
     def on_pre_enter(self):
-        repo = Repository()
-        try:
-            orders = repo.api.get_orders()
-            print("Полученные заказы:")
-            for order in orders:
-                print(f"Order ID: {order.id}")
-                print(f"Order Name: {order.name}")
-                print(f"Process Type ID: {order.process_type_id}")
-                print(f"Process Type: {order.process_type}")
-                if isinstance(order.process_type, ProcessType):
-                    print(f"Stages: {order.process_type.stages}")
-                print("---")
-
-            self.all_orders = orders
-            self.update_orders_view(orders)
-        except Exception as e:
-            print(f"Error loading orders: {e}")
+        repo = self.services.repository
+        # Сразу показываем локальную копию, обновление с сервера — в фоне
+        self._show_orders(repo.get_local_orders())
+        if repo.catalog.is_stale() or not self.all_orders:
+            self.refresh_orders()
+        else:
+            self._update_freshness(repo)
+
+    def refresh_orders(self):
+        """Обновляет справочник заказов с сервера (кнопка «Обновить»)"""
+        repo = self.services.repository
+        self.ids.catalog_status.text = "Обновление списка заказов..."
+        repo.refresh_orders(
+            callback=self._on_orders_refreshed,
+            error_callback=self._on_orders_refresh_failed,
+        )
+
+    def _on_orders_refreshed(self, orders):
+        self._show_orders(orders)
+        self._update_freshness(self.services.repository)
+
+    def _on_orders_refresh_failed(self, error):
+        print(f"Error loading orders: {error}")
+        self._update_freshness(self.services.repository, error="нет связи с сервером")
+
+    def _show_orders(self, orders):
+        self.all_orders = orders
+        self._search_index.build(orders)
+        self._apply_filter(self.ids.search_field.text)
+
+    def _update_freshness(self, repo, error=None):
+        updated_at = repo.catalog.updated_at()
+        text = (
+            f"Обновлено: {updated_at.strftime('%d.%m %H:%M')}"
+            if updated_at else "Список заказов ещё не загружался"
+        )
+        if error:
+            text += f" ({error})"
+        self.ids.catalog_status.text = text
 
     def filter_orders(self, search_text):
-        """Фильтруем список заказов по тексту поиска."""
-        filtered = [
-            order for order in self.all_orders
-            if search_text.lower() in order.name.lower()
-        ]
-        filtered = sorted(filtered, key=lambda o: o.name)  # сортировка
-        self.update_orders_view(filtered)
+        """Фильтрует список заказов после паузы в наборе текста."""
+        if self._search_event:
+            self._search_event.cancel()
+        self._search_event = Clock.schedule_once(
+            lambda dt: self._apply_filter(search_text), self.SEARCH_DEBOUNCE
+        )
+
+    def _apply_filter(self, search_text):
+        self._search_event = None
+        self.update_orders_view(self._search_index.search(search_text))
 
     def update_orders_view(self, orders):
-        self.ids.order_rv.data = [
+        new_data = [
             {
                 "order_id": order.id,
                 "text": order.name,  # <-- вот это обязательно!
@@ -59,6 +93,19 @@ class OrderSelectScreen(Screen):
             }
             for order in orders
         ]
+        data = self.ids.order_rv.data
+        # Заменяем только отличающийся участок: общие начало и конец не трогаем
+        start = 0
+        common = min(len(data), len(new_data))
+        while start < common and data[start] == new_data[start]:
+            start += 1
+        end_old, end_new = len(data), len(new_data)
+        while end_old > start and end_new > start and data[end_old - 1] == new_data[end_new - 1]:
+            end_old -= 1
+            end_new -= 1
+        if start == end_old and start == end_new:
+            return
+        data[start:end_old] = new_data[start:end_new]
 
     def select_order(self, order_id):
         self.manager.current = "order_select"
@@ -69,7 +116,12 @@ class OrderSelectScreen(Screen):
             print(f"Process type ID: {order.process_type_id}")
             AppSession.order = order
             self.selected_order_id = order.id
-            self.filter_orders(self.ids.search_field.text)
+            # Этапы заказа загружаются заранее, чтобы выбор этапа открывался из памяти
+            process_type_id = order.get_process_type_id()
+            if isinstance(order.process_type, ProcessType) and order.process_type.stages:
+                AppSession.stages_cache.put(process_type_id, order.process_type)
+            self.services.repository.prefetch_stages(process_type_id)
+            self._apply_filter(self.ids.search_field.text)
 
             # Проверяем наличие process_type и stages
             if isinstance(order.process_type, ProcessType):
@@ -1,4 +1,100 @@
+import os
+import time
+
+from kivy.app import App
+from kivy.metrics import dp
+from kivy.properties import ObjectProperty
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.popup import Popup
 from kivy.uix.screenmanager import Screen
 
+from utils.timings import timings
+
+
 class SettingsScreen(Screen):
-    pass
+    services = ObjectProperty(None)
+    # Скрытый экран диагностики: столько касаний заголовка за DIAGNOSTICS_WINDOW секунд
+    DIAGNOSTICS_TAPS = 5
+    DIAGNOSTICS_WINDOW = 3.0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._title_taps = []
+        self._diagnostics_label = None
+
+    def on_touch_down(self, touch):
+        top_bar = self.ids.get("top_bar")
+        if top_bar is not None and top_bar.collide_point(*touch.pos):
+            self._on_title_tap()
+        return super().on_touch_down(touch)
+
+    def _on_title_tap(self):
+        now = time.monotonic()
+        self._title_taps = [tap for tap in self._title_taps if now - tap < self.DIAGNOSTICS_WINDOW]
+        self._title_taps.append(now)
+        if len(self._title_taps) >= self.DIAGNOSTICS_TAPS:
+            self._title_taps = []
+            self.open_diagnostics()
+
+    def open_diagnostics(self):
+        """Показывает p50/p95/p99 этапов обработки скана"""
+        layout = BoxLayout(orientation="vertical", spacing=dp(6), padding=dp(8))
+        label = Label(font_name="RobotoMono-Regular", halign="left", valign="top")
+        label.bind(size=lambda widget, size: setattr(widget, "text_size", size))
+        layout.add_widget(label)
+        buttons = BoxLayout(size_hint_y=None, height=dp(44), spacing=dp(6))
+        popup = Popup(title="Диагностика сканирования", content=layout, size_hint=(0.95, 0.9))
+        toggle = Button(text=self._timings_toggle_text())
+        toggle.bind(on_release=self._toggle_timings)
+        buttons.add_widget(toggle)
+        for text, action in (
+                ("Обновить", self._refresh_diagnostics),
+                ("Сбросить", self._reset_diagnostics),
+                ("Сохранить JSON", self._dump_diagnostics),
+                ("Закрыть", popup.dismiss),
+        ):
+            button = Button(text=text)
+            button.bind(on_release=lambda btn, action=action: action())
+            buttons.add_widget(button)
+        layout.add_widget(buttons)
+        self._diagnostics_label = label
+        self._refresh_diagnostics()
+        popup.open()
+
+    def _refresh_diagnostics(self, status: str = ""):
+        stats = timings.stats()
+        lines = [f"{'этап':22} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  мс"]
+        for name, stage in stats.items():
+            lines.append(
+                f"{name:22} {stage['count']:6d} {stage['p50']:8.1f} {stage['p95']:8.1f}"
+                f" {stage['p99']:8.1f} {stage['max']:8.1f}"
+            )
+        if not stats:
+            lines.append("Замеров пока нет" if timings.enabled else "Замеры выключены")
+        if status:
+            lines += ["", status]
+        self._diagnostics_label.text = "\n".join(lines)
+
+    @staticmethod
+    def _timings_toggle_text() -> str:
+        return "Выключить замеры" if timings.enabled else "Включить замеры"
+
+    def _toggle_timings(self, button):
+        timings.enabled = not timings.enabled
+        button.text = self._timings_toggle_text()
+        self._refresh_diagnostics()
+
+    def _reset_diagnostics(self):
+        timings.reset()
+        self._refresh_diagnostics()
+
+    def _dump_diagnostics(self):
+        path = os.path.join(App.get_running_app().user_data_dir, "scan_timings.json")
+        try:
+            timings.dump(path)
+        except OSError as e:
+            self._refresh_diagnostics(f"Не удалось сохранить: {e}")
+        else:
+            self._refresh_diagnostics(f"Сохранено: {path}")